@@ -0,0 +1,134 @@
+# announcement.py
+import asyncio
+import hashlib
+import json
+import logging
+import discord
+from state_store import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+def announcement_hash(embed, view):
+    """공지 내용(embed와 버튼 custom_id)이 같으면 같은 값을 돌려줍니다."""
+    components = [item.custom_id for item in view.children] if view else None
+    payload = json.dumps([embed.to_dict(), components], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AnnouncementManager:
+    """인증 채널의 공지 메시지를 관리합니다.
+
+    채널 ID, 메시지 ID, 마지막으로 반영한 공지 내용의 해시를 파일에 저장해 두고, 내용이 같으면 디스코드 REST 요청을 보내지 않습니다.
+    단, 프로세스마다 첫 반영은 한 번 수정해 보아 메시지가 삭제되었으면 다시 만듭니다.
+    메시지는 fetch 없이 PartialMessage로 바로 수정하며, 온라인/오프라인 전환은 debounce초 동안 모아 마지막 상태만 반영합니다.
+    """
+
+    def __init__(self, get_channel, build, path="announcement_state.json", legacy_path="announcement_message_id.txt", debounce=2.0):
+        self.get_channel = get_channel  # () -> 인증 채널
+        self.build = build  # (offline) -> (embed, view)
+        self.path = path
+        self.legacy_path = legacy_path
+        self.debounce = debounce
+        self.channel_id = None
+        self.message_id = None
+        self.state_hash = None
+        self.message = None
+        self.verified = False  # 이번 프로세스에서 메시지가 남아 있는지 확인했는지
+        self.desired_offline = False
+        self._lock = asyncio.Lock()
+        self._debounce_task = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.channel_id, self.message_id, self.state_hash = state.get("channel_id"), state.get("message_id"), state.get("state_hash")
+            return
+        except FileNotFoundError:
+            pass
+        except (ValueError, AttributeError) as e:
+            logger.warning("공지 상태 파일을 읽을 수 없습니다: %s. 무시합니다.", e)
+            return
+        # 이전 버전의 메시지 ID 파일 (내용 해시가 없으므로 첫 반영 때 한 번 수정)
+        try:
+            with open(self.legacy_path, "r") as f:
+                self.message_id = int(f.read().strip())
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def _save(self):
+        atomic_write(self.path, json.dumps({"channel_id": self.channel_id, "message_id": self.message_id, "state_hash": self.state_hash}))
+
+    def _reset(self):
+        self.message_id = self.state_hash = self.message = None
+        self._save()
+
+    async def update(self, offline=False, immediate=False):
+        """공지를 offline 상태로 바꿉니다. immediate가 아니면 debounce초 뒤에 마지막 요청만 반영합니다."""
+        self.desired_offline = offline
+        if immediate:
+            if self._debounce_task:
+                self._debounce_task.cancel()
+                self._debounce_task = None
+            await self._apply(offline)
+        elif self._debounce_task is None or self._debounce_task.done():
+            self._debounce_task = asyncio.create_task(self._apply_later())
+
+    async def _apply_later(self):
+        await asyncio.sleep(self.debounce)
+        self._debounce_task = None
+        await self._apply(self.desired_offline)
+
+    async def _apply(self, offline):
+        async with self._lock:
+            channel = self.get_channel()
+            if not channel:
+                logger.error("인증 채널을 찾을 수 없어 공지를 반영하지 못했습니다.")
+                return
+            if self.channel_id is not None and self.channel_id != channel.id:
+                # 인증 채널이 바뀌면 이전 채널의 메시지는 두고 새 채널에 공지를 만듦
+                logger.info("인증 채널이 바뀌어 새 공지를 생성합니다. old_channel=%s channel=%s", self.channel_id, channel.id)
+                self._reset()
+            self.channel_id = channel.id
+            embed, view = self.build(offline)
+            state_hash = announcement_hash(embed, view)
+            if self.message_id and self.verified and state_hash == self.state_hash:
+                return
+
+            if self.message_id:
+                if self.message is None or self.message.id != self.message_id:
+                    self.message = channel.get_partial_message(self.message_id)
+                try:
+                    await self.message.edit(embed=embed, view=view)
+                    self.state_hash, self.verified = state_hash, True
+                    self._save()
+                    logger.info("기존 공지 메시지를 수정했습니다.")
+                    return
+                except discord.NotFound:
+                    logger.warning("저장된 ID의 공지 메시지를 찾을 수 없습니다. 새로 생성합니다. channel=%s", channel.id)
+                    self._reset()
+                except discord.HTTPException as e:
+                    logger.warning("공지 메시지 수정 중 오류 발생: channel=%s error=%s", channel.id, e)
+                    return
+            await self._create(channel, embed, view, state_hash)
+
+    async def _create(self, channel, embed, view, state_hash):
+        try:
+            self.message = await channel.send(embed=embed, view=view)
+        except discord.Forbidden:
+            logger.error("'%s' 채널에 메시지를 보낼 권한이 없습니다. channel=%s", channel.name, channel.id)
+            return
+        except discord.HTTPException as e:
+            logger.warning("새 공지 메시지 생성 중 오류 발생: channel=%s error=%s", channel.id, e)
+            return
+        self.message_id, self.state_hash, self.verified = self.message.id, state_hash, True
+        self._save()
+        logger.info("새로운 공지 메시지를 전송하고 ID를 저장했습니다.")
+
+    async def close(self):
+        if self._debounce_task:
+            self._debounce_task.cancel()
+            await asyncio.gather(self._debounce_task, return_exceptions=True)
+            self._debounce_task = None
@@ -0,0 +1,61 @@
+# auth_queue.py
+import asyncio
+import logging
+from instrumentation import AUTH_QUEUE_DEPTH, AUTH_QUEUE_DROPPED
+
+logger = logging.getLogger(__name__)
+
+
+class AuthWorkQueue:
+    """채팅 수신 루프와 디스코드 역할 부여 사이의 제한된 크기의 작업 큐입니다.
+
+    submit()은 절대 대기하지 않으므로 디스코드 REST 지연이 웹소켓 recv 루프를 막지 않습니다.
+    큐가 가득 차면 새 요청은 버려지고 dropped 카운터가 증가합니다.
+    """
+
+    def __init__(self, handler, max_size=1000, worker_count=4):
+        self.handler = handler
+        self.worker_count = worker_count
+        self.queue = asyncio.Queue(maxsize=max_size)
+        self.workers = []
+        self._overflowing = False
+        self.stats = {"submitted": 0, "processed": 0, "dropped": 0, "failed": 0, "max_depth": 0}
+
+    def start(self):
+        AUTH_QUEUE_DEPTH.set_function(self.queue.qsize)
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def submit(self, *args):
+        try:
+            self.queue.put_nowait(args)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            AUTH_QUEUE_DROPPED.inc()
+            if not self._overflowing:
+                # 넘침이 시작될 때 한 번만 출력하여 폭주 중 출력 I/O를 막음
+                self._overflowing = True
+                logger.warning("인증 작업 큐가 가득 차 요청을 버리기 시작했습니다. dropped=%d max_size=%d", self.stats["dropped"], self.queue.maxsize)
+            return False
+        self._overflowing = False
+        self.stats["submitted"] += 1
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.queue.qsize())
+        return True
+
+    async def _worker(self):
+        while True:
+            args = await self.queue.get()
+            try:
+                await self.handler(*args)
+                self.stats["processed"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.warning("인증 작업 처리 중 오류 발생: error=%s", e)
+            finally:
+                self.queue.task_done()
+
+    async def close(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
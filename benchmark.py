@@ -0,0 +1,668 @@
+# benchmark.py
+"""인증 파이프라인 부하 측정 도구.
+
+로컬 가짜 치지직 채팅 웹소켓 서버와 가짜 디스코드 서버(멤버 REST 지연 흉내)를 띄우고,
+실제 ChzzkAPI.listen_chat -> AuthWorkQueue -> DiscordBot.handle_successful_auth 경로로
+채팅을 흘려 보내 처리량, 인증 지연(p50/p99), 이벤트 루프 지연을 측정합니다. 네트워크 접속이 필요 없습니다.
+
+    python benchmark.py --rate 5000 --duration 10 --valid-share 0.01
+    python benchmark.py --replay chat_log.jsonl
+    python benchmark.py --reconcile-members 100000 --discord-latency 0.01
+    python benchmark.py --startup ingest
+    python benchmark.py --auth-cold-start                      # 새 프로세스의 브라우저 없는 전체 인증 소요 시간
+    python benchmark.py --rate 10000 --spam-share 0.9          # 무작위 숫자 도배 (--no-throttle과 비교)
+    python benchmark.py --pending-expiry 10000                 # 인증 대기 만료 처리 방식별 메모리
+    python benchmark.py --pending-lookup                       # 인증 대기 10~10만 건에서 코드 조회 비용
+    python benchmark.py --channels 50 --rate 5000              # 치지직 채널 50개 동시 수신 시 채널당 메모리
+    python benchmark.py --make-replay chat_log.jsonl --messages 100000   # 재생용 채팅 로그 생성
+    python benchmark.py --compare-codecs --replay chat_log.jsonl         # 설치된 코덱별 수신 처리 속도 비교
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import websockets
+import websockets.exceptions
+
+from auth_queue import AuthWorkQueue
+from channel_manager import ChannelRoute, ChzzkChannelManager
+from chzzk_api import CHAT_CODECS, ChzzkAPI, ChzzkAuth
+from discord_bot import DiscordBot
+from fake_discord import FakeGuild, FakeMember
+from reconcile import RoleReconciler
+from role_scheduler import RoleGrantScheduler
+from state_store import StateStore
+from verification_store import PendingVerificationStore
+from instrumentation import current_rss, setup_logging
+from shared_store import open_shared_store
+from sharding import PendingCodePublisher, SharedCodeFilter, SharedEventConsumer
+
+BENCH_CHANNEL_ID = "bench-channel"
+BENCH_GUILD_ID = 1
+BENCH_ROLE_ID = 2
+# 지연 로딩 전에 시작 시점에 불러오던 무거운 모듈 (--startup 비교용)
+EAGER_MODULES = ["selenium.webdriver", "selenium.webdriver.chrome.service", "selenium.webdriver.chrome.options",
+                 "selenium.webdriver.support.ui", "selenium.webdriver.support.expected_conditions", "aiohttp.web", "bs4"]
+NOISE_MESSAGES = ["ㅋㅋㅋㅋ", "안녕하세요", "오늘 방송 재밌네요", "1234567", "12345", "ㄱㄱ", "?", "굿굿"]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class ReportingMember(FakeMember):
+    """역할이 부여될 때마다 report에 기록하는 가짜 멤버."""
+
+    def __init__(self, member_id, report):
+        super().__init__(member_id, report.discord_latency)
+        self.report = report
+
+    async def edit(self, roles=None, nick=None, reason=None):
+        await super().edit(roles=roles, nick=nick, reason=reason)
+        if roles is not None:
+            self.report.role_granted(self.id)
+
+    async def add_roles(self, *roles, reason=None):
+        await super().add_roles(*roles, reason=reason)
+        self.report.role_granted(self.id)
+
+
+class ReportingGuild(FakeGuild):
+    """멤버 수정이 discord_latency만큼 지연되고 역할 부여를 report에 기록하는 가짜 서버."""
+
+    def __init__(self, report, guild_id=BENCH_GUILD_ID):
+        super().__init__(guild_id, BENCH_ROLE_ID, report.discord_latency)
+        self.report = report
+
+    def new_member(self, member_id):
+        return ReportingMember(member_id, self.report)
+
+
+class Report:
+    def __init__(self, discord_latency):
+        self.discord_latency = discord_latency
+        self.code_sent_at = {}  # {code: 채팅 전송 시각}
+        self.member_code = {}  # {member_id: code}
+        self.latencies = []
+        self.loop_lags = []
+        self.matcher_calls = 0  # 인증 코드 조회(pending code filter)까지 도달한 채팅 수
+        self.guessed = 0  # 도배 사용자가 맞혀서 인증 처리로 넘어간 코드 수
+
+    def role_granted(self, member_id):
+        sent_at = self.code_sent_at.pop(self.member_code.pop(member_id, None), None)
+        if sent_at is not None:
+            self.latencies.append(time.perf_counter() - sent_at)
+
+
+def chat_frame(items):
+    return json.dumps({"svcid": "game", "ver": "1", "cmd": 93101, "tid": None, "cid": BENCH_CHANNEL_ID, "bdy": [
+        {"svcid": "game", "cid": BENCH_CHANNEL_ID, "uid": uid, "msg": msg, "msgTypeCode": 1, "msgStatusType": "NORMAL",
+         "extras": "{}", "ctime": 0, "utime": 0,
+         "profile": json.dumps({"userIdHash": uid, "nickname": f"시청자{uid}", "userRoleCode": "common_user", "badge": None, "activityBadges": []}, ensure_ascii=False)}
+        for uid, msg in items
+    ]}, ensure_ascii=False)
+
+
+def generate_replay(path, messages, batch=10, code_share=0.01, seed=0):
+    """재생용 채팅 로그(한 줄에 웹소켓 프레임 하나)를 만듭니다. code_share 비율만큼은 6자리 숫자 채팅입니다."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for start in range(0, messages, batch):
+            items = [(f"u{rng.randrange(100000)}", str(rng.randint(100000, 999999)) if rng.random() < code_share else rng.choice(NOISE_MESSAGES))
+                     for _ in range(min(batch, messages - start))]
+            f.write(chat_frame(items) + "\n")
+
+
+class ReplaySocket:
+    """기록된 프레임을 네트워크 없이 recv로 돌려주고, 다 돌려주면 정상 종료합니다."""
+
+    def __init__(self, frames):
+        self.frames = iter(frames)
+
+    async def recv(self):
+        for frame in self.frames:
+            return frame
+        raise websockets.exceptions.ConnectionClosedOK(None, None)
+
+    async def send(self, data):
+        pass
+
+
+async def synthesize(websocket, args, codes, report):
+    """초당 rate개의 채팅을 batch개씩 묶어 전송합니다. valid_share 비율만큼은 발급된 인증 코드입니다.
+
+    spam_share 비율만큼은 spammers명이 무작위 6자리 숫자를 도배하는 채팅입니다.
+    """
+    interval = args.batch / args.rate
+    deadline = time.perf_counter() + args.duration
+    next_send = time.perf_counter()
+    while time.perf_counter() < deadline:
+        items = []
+        for _ in range(args.batch):
+            uid = f"u{random.randrange(100000)}"
+            roll = random.random()
+            if roll < args.spam_share:
+                items.append((f"spam{random.randrange(args.spammers)}", str(random.randint(100000, 999999))))
+            elif codes and roll < args.spam_share + args.valid_share:
+                code = codes.pop()
+                report.code_sent_at[code] = time.perf_counter()
+                items.append((uid, code))
+            else:
+                items.append((uid, random.choice(NOISE_MESSAGES)))
+        await websocket.send(chat_frame(items))
+        next_send += interval
+        await asyncio.sleep(max(0, next_send - time.perf_counter()))
+
+
+async def replay(websocket, args):
+    """기록된 채팅 로그(한 줄에 웹소켓 프레임 하나)를 그대로 다시 보냅니다."""
+    interval = 1 / args.rate if args.rate else 0
+    with open(args.replay, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                await websocket.send(line)
+                await asyncio.sleep(interval)
+
+
+async def measure_loop_lag(report, interval=0.01):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        report.loop_lags.append(time.perf_counter() - started - interval)
+
+
+async def run(args):
+    report = Report(args.discord_latency)
+    done = asyncio.Event()
+
+    async def chat_server(websocket):
+        await websocket.recv()  # 연결(cmd 100) 프레임
+        if args.replay:
+            await replay(websocket, args)
+        else:
+            await synthesize(websocket, args, codes, report)
+        done.set()
+        await websocket.wait_closed()
+
+    if args.codec:
+        os.environ["CHZZK_JSON_CODEC"] = args.codec
+    os.environ["STATE_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    async with websockets.serve(chat_server, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        manager = ChzzkChannelManager([ChannelRoute(BENCH_CHANNEL_ID, BENCH_GUILD_ID, BENCH_ROLE_ID)])
+        manager.auth.access_token = "bench-token"
+        manager.auth.token_expiry_time = datetime.now() + timedelta(days=1)
+        api = manager.get_api(BENCH_CHANNEL_ID)
+        api.chat_server_uri = f"ws://127.0.0.1:{port}"
+        api.chat_channel_id = BENCH_CHANNEL_ID
+
+        bot = DiscordBot(manager, auth_channel_id=0, auth_role_id=BENCH_ROLE_ID)
+        guild = ReportingGuild(report)
+        bot.get_guild = lambda guild_id: guild if guild_id == BENCH_GUILD_ID else None
+
+        expected_valid = int(args.rate * args.duration * args.valid_share * 1.2) + 1
+        codes = []
+        for member_id in range(1, min(expected_valid, args.max_pending) + 1):
+            code = bot.verifying_users.create(member_id, guild_id=BENCH_GUILD_ID).code
+            report.member_code[member_id] = code
+            codes.append(code)
+
+        shared = []  # ingest/discord 프로세스 분리 모드를 한 프로세스에서 흉내 낼 때의 작업들
+        if args.shared_store:
+            # 채팅 수신 -> 공유 큐 -> 디스코드 쪽 소비자 경로로 처리
+            store = open_shared_store(args.shared_store)
+            publisher = PendingCodePublisher(store, bot.verifying_users)
+            await publisher.publish()
+            code_filter = SharedCodeFilter(store)
+            await code_filter.refresh()
+            consumer = SharedEventConsumer(store, bot.handle_successful_auth, bot.verifying_users.has_code, worker_count=args.workers)
+            await consumer.start()
+            shared = [publisher, code_filter, consumer]
+            auth_queue = AuthWorkQueue(store.push_event, max_size=args.queue_size, worker_count=args.workers)
+            matcher = code_filter.has_code
+        else:
+            auth_queue = AuthWorkQueue(bot.handle_successful_auth, max_size=args.queue_size, worker_count=args.workers)
+            matcher = bot.verifying_users.has_code
+
+        def counted_matcher(code):
+            report.matcher_calls += 1
+            return matcher(code)
+
+        async def submit(chzzk_nickname, auth_code, chzzk_channel_id=None, chzzk_uid=None):
+            if chzzk_uid and chzzk_uid.startswith("spam"):
+                report.guessed += 1
+            return await auth_queue.submit(chzzk_nickname, auth_code, chzzk_channel_id, chzzk_uid)
+
+        manager.set_pending_code_filter(counted_matcher)
+        manager.set_on_auth_message_callback(submit)
+        if args.no_throttle:
+            manager.set_chat_throttle(None)
+
+        lag_task = asyncio.create_task(measure_loop_lag(report))
+        output = io.StringIO()
+        setup_logging(stream=output)
+        with contextlib.redirect_stdout(output):
+            auth_queue.start()
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            listen_task = asyncio.create_task(manager.listen_chat())
+            await done.wait()
+            await asyncio.sleep(0.2)  # 마지막 프레임이 처리되도록 잠시 대기
+            chat_elapsed = time.perf_counter() - started
+            chat_cpu = time.process_time() - cpu_started
+            await auth_queue.queue.join()
+            if shared:
+                await consumer.join()
+            elapsed = time.perf_counter() - started
+            api.is_listening = False
+            listen_task.cancel()
+            await asyncio.gather(listen_task, return_exceptions=True)
+            await auth_queue.close()
+            for worker in shared:
+                await worker.close()
+            if shared:
+                await store.close()
+            await manager.close()
+        lag_task.cancel()
+
+    stats = api.chat_stats
+    print(f"코덱: {api.codec.name}")
+    print(f"채팅 메시지: {stats['seen']}건 ({stats['seen'] / chat_elapsed:,.0f} msg/s), 걸러짐 {stats['rejected']}건, 전달 {stats['forwarded']}건")
+    print(f"코드 조회: {report.matcher_calls}건, 속도 제한으로 버림 {stats['throttled']}건, 도배로 맞힌 코드 {report.guessed}건, "
+          f"CPU {chat_cpu / max(stats['seen'], 1) * 1e6:.1f}us/msg")
+    print(f"인증 완료: {len(report.latencies)}건 (모두 처리까지 {elapsed:.1f}초), 지연 p50 {percentile(report.latencies, 0.5) * 1000:.1f}ms, p99 {percentile(report.latencies, 0.99) * 1000:.1f}ms")
+    print(f"인증 큐: {auth_queue.stats}")
+    print(f"이벤트 루프 지연: p50 {percentile(report.loop_lags, 0.5) * 1000:.1f}ms, p99 {percentile(report.loop_lags, 0.99) * 1000:.1f}ms, 최대 {max(report.loop_lags, default=0) * 1000:.1f}ms")
+    print(f"출력된 로그: {output.getvalue().count(chr(10))}줄")
+
+
+async def run_reconcile(args):
+    """가짜 서버 멤버 reconcile_members명의 역할을 인증 기록과 대조합니다. 절반쯤에서 한 번 끊긴 뒤 체크포인트부터 이어서 진행합니다."""
+    report = Report(args.discord_latency)
+    guild = ReportingGuild(report)
+    state_store = StateStore(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    await state_store.open()
+    rng = random.Random(0)
+    expected = {"granted": 0, "revoked": 0}
+    for member_id in range(1, args.reconcile_members + 1):
+        member = guild.get_member(member_id)
+        verified = rng.random() < 0.5
+        # 인증 기록은 있는데 역할이 빠진 멤버 2%, 기록 없이 역할만 있는 멤버 1%
+        has_role = rng.random() < (0.98 if verified else 0.01)
+        if verified:
+            state_store.mark_verified(guild.id, member_id, f"시청자{member_id}")
+            expected["granted"] += not has_role
+        elif has_role:
+            expected["revoked"] += 1
+        if has_role:
+            member.roles.append(guild.role)
+    await state_store.flush()
+
+    reconciler = RoleReconciler(state_store, RoleGrantScheduler(concurrency=args.workers), revoke=True, dry_run=False)
+    guild.fail_after = args.reconcile_members // 2
+    started = time.perf_counter()
+    try:
+        await reconciler.run(guild, guild.role)
+    except ConnectionError:
+        checkpoint = await state_store.load_checkpoint(guild.id)
+        print(f"중단됨: 체크포인트 멤버 ID {checkpoint[0] if checkpoint else None}")
+    stats = await reconciler.run(guild, guild.role)
+    elapsed = time.perf_counter() - started
+    rerun = await reconciler.run(guild, guild.role)
+    await state_store.close()
+
+    print(f"멤버 {stats['scanned']}명 대조: {elapsed:.1f}초 ({stats['scanned'] / elapsed:,.0f}명/s)")
+    print(f"부여 {stats['granted']}건 (기대 {expected['granted']}), 회수 {stats['revoked']}건 (기대 {expected['revoked']}), 실패 {stats['failed']}건")
+    print(f"다시 실행했을 때 변경: 부여 {rerun['granted']}건, 회수 {rerun['revoked']}건")
+
+
+async def run_startup(args):
+    """새 프로세스를 띄워 첫 채팅 프레임을 받을 때까지 걸린 시간과 RSS를, 무거운 모듈을 미리 불러온 경우와 비교합니다."""
+    async def chat_server(websocket):
+        await websocket.recv()  # 연결(cmd 100) 프레임
+        await websocket.send(chat_frame([("u1", "123456")]))
+        await websocket.wait_closed()
+
+    eager = EAGER_MODULES + (["discord"] if args.startup == "ingest" else [])
+    async with websockets.serve(chat_server, "127.0.0.1", 0) as server:
+        uri = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        for label, preload in (("지연 로딩 전", eager), ("현재", [])):
+            samples = []
+            for _ in range(args.startup_runs):
+                spawned = time.perf_counter()
+                process = await asyncio.create_subprocess_exec(
+                    sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_profile.py"),
+                    args.startup, "--first-frame", uri, "--preload", ",".join(preload),
+                    stdout=asyncio.subprocess.PIPE, env={**os.environ, "LOG_LEVEL": "WARNING"}
+                )
+                line = await process.stdout.readline()
+                elapsed = time.perf_counter() - spawned
+                await process.wait()
+                result = json.loads(line)
+                result["wall_seconds"] = elapsed
+                samples.append(result)
+            first_frame = sorted(sample["wall_seconds"] for sample in samples)[len(samples) // 2]
+            imports = sorted(sample["import_seconds"] for sample in samples)[len(samples) // 2]
+            rss = sorted(sample["rss"] for sample in samples)[len(samples) // 2]
+            print(f"{label}: 첫 채팅 프레임까지 {first_frame * 1000:.0f}ms (import {imports * 1000:.0f}ms), "
+                  f"RSS {rss / 1024 / 1024:.1f}MiB, 모듈 {samples[0]['modules']}개, 미리 불러온 모듈 {samples[0]['preloaded']}")
+
+
+async def run_channels(args):
+    """치지직 채널 n개(서버도 n개)를 한 프로세스에서 동시에 수신할 때 채널당 메모리와 전체 처리량을 측정합니다.
+
+    채널마다 초당 rate/n개의 채팅을 보내고, valid_share 비율만큼은 해당 서버에서 발급된 인증 코드입니다.
+    """
+    count = args.channels
+    report = Report(args.discord_latency)
+    connected = set()
+    all_connected = asyncio.Event()
+    stop = asyncio.Event()
+    codes_by_channel = {}
+
+    async def chat_server(websocket):
+        channel_id = json.loads(await websocket.recv())["cid"]  # 연결(cmd 100) 프레임
+        connected.add(channel_id)
+        if len(connected) == count:
+            all_connected.set()
+        codes = codes_by_channel[channel_id]
+        interval = args.batch * count / args.rate
+        while not stop.is_set():
+            items = []
+            for _ in range(args.batch):
+                uid = f"u{random.randrange(100000)}"
+                if codes and random.random() < args.valid_share:
+                    code = codes.pop()
+                    report.code_sent_at[code] = time.perf_counter()
+                    items.append((uid, code))
+                else:
+                    items.append((uid, random.choice(NOISE_MESSAGES)))
+            await websocket.send(chat_frame(items))
+            await asyncio.sleep(interval)
+
+    os.environ["STATE_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.chdir(tempfile.mkdtemp())  # 서버별 공지 상태 파일
+    async with websockets.serve(chat_server, "127.0.0.1", 0) as server:
+        uri = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        output = io.StringIO()
+        setup_logging("WARNING", stream=output)
+        rss_before = current_rss()
+        tracemalloc.start()
+        routes = [ChannelRoute(f"{BENCH_CHANNEL_ID}-{i}", BENCH_GUILD_ID + i, BENCH_ROLE_ID, 100000 + i) for i in range(count)]
+        manager = ChzzkChannelManager(routes)
+        manager.auth.access_token = "bench-token"
+        manager.auth.token_expiry_time = datetime.now() + timedelta(days=1)
+        for api in manager.apis.values():
+            api.chat_server_uri = uri
+            api.chat_channel_id = api.channel_id
+        bot = DiscordBot(manager, auth_channel_id=0, auth_role_id=BENCH_ROLE_ID)
+        guilds = {}
+        for route in routes:
+            guilds[route.guild_id] = ReportingGuild(report, route.guild_id)
+        bot.get_guild = guilds.get
+
+        codes_per_channel = int(args.rate / count * args.duration * args.valid_share * 1.2) + 1
+        member_id = 0
+        for route in routes:
+            codes_by_channel[route.chzzk_channel_id] = []
+            for _ in range(codes_per_channel):
+                member_id += 1
+                code = bot.verifying_users.create(member_id, guild_id=route.guild_id).code
+                report.member_code[member_id] = code
+                codes_by_channel[route.chzzk_channel_id].append(code)
+
+        auth_queue = AuthWorkQueue(bot.handle_successful_auth, max_size=args.queue_size, worker_count=args.workers)
+        manager.set_pending_code_filter(bot.verifying_users.has_code)
+        manager.set_on_auth_message_callback(auth_queue.submit)
+        auth_queue.start()
+        listen_task = asyncio.create_task(manager.listen_chat())
+        await asyncio.wait_for(all_connected.wait(), timeout=30)
+        await asyncio.sleep(0.5)  # 연결 직후 버퍼가 채워지도록 잠시 수신
+        traced = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        rss_after = current_rss()
+
+        lag_task = asyncio.create_task(measure_loop_lag(report))
+        with contextlib.redirect_stdout(output):
+            started = time.perf_counter()
+            seen_before = sum(api.chat_stats["seen"] for api in manager.apis.values())
+            await asyncio.sleep(args.duration)
+            seen = sum(api.chat_stats["seen"] for api in manager.apis.values()) - seen_before
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await auth_queue.queue.join()
+            for api in manager.apis.values():
+                api.is_listening = False
+            listen_task.cancel()
+            await asyncio.gather(listen_task, return_exceptions=True)
+            await auth_queue.close()
+            await manager.close()
+            await bot.state_store.close()
+        lag_task.cancel()
+
+    print(f"치지직 채널 {count}개 (서버 {len(guilds)}개, 공지 {len(bot.announcements)}개)")
+    print(f"채널당 메모리: Python 할당 {traced / count / 1024:.0f}KiB, RSS {(rss_after - rss_before) / count / 1024:.0f}KiB "
+          f"(전체 {traced / 1024 / 1024:.1f}MiB / RSS {(rss_after - rss_before) / 1024 / 1024:.1f}MiB)")
+    print(f"채팅 메시지: {seen}건 ({seen / elapsed:,.0f} msg/s), 인증 완료 {len(report.latencies)}건, "
+          f"지연 p50 {percentile(report.latencies, 0.5) * 1000:.1f}ms, p99 {percentile(report.latencies, 0.99) * 1000:.1f}ms")
+    print(f"이벤트 루프 지연: p50 {percentile(report.loop_lags, 0.5) * 1000:.1f}ms, p99 {percentile(report.loop_lags, 0.99) * 1000:.1f}ms")
+
+
+async def run_codecs(args):
+    """같은 채팅 로그를 설치된 코덱마다 실제 수신 루프(_receive_chat)로 처리해 속도를 비교합니다."""
+    path = args.replay
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(), "chat_log.jsonl")
+        generate_replay(path, args.messages, args.batch)
+    with open(path, encoding="utf-8") as f:
+        frames = [line.strip() for line in f if line.strip()]
+
+    async def forward(*args):
+        pass
+
+    baseline = None
+    auth = ChzzkAuth()
+    for name, codec_class in reversed(CHAT_CODECS.items()):  # json부터 측정해 기준으로 사용
+        try:
+            codec = codec_class()
+        except ImportError:
+            print(f"{name}: 설치되지 않음")
+            continue
+        api = ChzzkAPI(BENCH_CHANNEL_ID, auth=auth)
+        api.codec = codec
+        api.set_chat_throttle(None)
+        api.set_pending_code_filter(lambda code: True)  # 코드 형태의 채팅은 모두 전달해 닉네임 디코딩까지 포함
+        api.set_on_auth_message_callback(forward)
+        api.is_listening = True
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            await api._receive_chat(ReplaySocket(frames))
+        except websockets.exceptions.ConnectionClosedOK:
+            pass
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+        seen = api.chat_stats["seen"]
+        baseline = baseline or elapsed
+        print(f"{name}: {seen}건 {elapsed * 1000:.0f}ms ({seen / elapsed:,.0f} msg/s, CPU {cpu / max(seen, 1) * 1e6:.2f}us/msg, json 대비 {baseline / elapsed:.2f}배)")
+    await auth.close()
+
+
+def run_pending_lookup(args):
+    """인증 대기 건수를 10건부터 10만 건까지 늘려 가며 채팅 코드 하나를 조회하는 비용을 잽니다.
+
+    이전 방식({유저 ID: 코드}를 처음부터 훑기)과 현재 방식(코드 -> 유저 ID 인덱스)을 비교합니다.
+    """
+    print(f"{'대기 건수':>10}{'현재 (ns/건)':>14}{'이전 (ns/건)':>14}")
+    for count in (10, 100, 1000, 10000, 100000):
+        store = PendingVerificationStore()
+        codes = [store.create(user_id).code for user_id in range(count)]
+        by_user = {entry.user_id: entry.code for entry in store.entries()}
+        rng = random.Random(count)
+        # 채팅에 올라오는 코드는 대부분 대기 중인 코드가 아니므로 절반은 없는 코드로 조회
+        probes = [rng.choice(codes) if rng.random() < 0.5 else str(rng.randint(100000, 999999)) for _ in range(args.lookups)]
+
+        started = time.perf_counter()
+        for code in probes:
+            store.get_by_code(code)
+        current = (time.perf_counter() - started) / len(probes)
+
+        linear_probes = probes[:max(10, args.lookups * 10 // count)]  # 큰 목록에서는 조회 횟수를 줄여 측정
+        started = time.perf_counter()
+        for code in linear_probes:
+            next((user_id for user_id, pending_code in by_user.items() if pending_code == code), None)
+        linear = (time.perf_counter() - started) / len(linear_probes)
+        print(f"{count:>10}{current * 1e9:>14.0f}{linear * 1e9:>14.0f}")
+
+
+async def run_pending_expiry(args):
+    """인증 대기 n건의 만료를, 버튼마다 코루틴을 재워 두던 이전 방식과 만료 힙 하나로 처리하는 현재 방식으로 메모리를 비교합니다."""
+    count, ttl = args.pending_expiry, 180
+
+    async def expire_later(pending, user_id):
+        await asyncio.sleep(ttl)
+        pending.pop(user_id, None)
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    pending = {}
+    tasks = []
+    for user_id in range(count):
+        pending[user_id] = f"{100000 + user_id}"
+        tasks.append(asyncio.create_task(expire_later(pending, user_id)))
+    await asyncio.sleep(0)  # 모든 태스크가 sleep에 들어가도록 함
+    before = tracemalloc.get_traced_memory()[0] - baseline
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    del pending, tasks
+
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = PendingVerificationStore(ttl=ttl)
+    for user_id in range(count):
+        store.create(user_id)
+    after = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    started = time.perf_counter()
+    expired = store.pop_expired(now=time.monotonic() + ttl)
+    expire_elapsed = time.perf_counter() - started
+
+    print(f"인증 대기 {count}건")
+    print(f"이전 (유저마다 만료 코루틴): {before / 1024 / 1024:.2f}MiB ({before / count:.0f}B/건), 태스크 {count}개")
+    print(f"현재 (만료 힙 + 양방향 인덱스): {after / 1024 / 1024:.2f}MiB ({after / count:.0f}B/건), 태스크 1개")
+    print(f"만료 {len(expired)}건을 한 번에 처리: {expire_elapsed * 1000:.1f}ms")
+
+
+async def run_auth_cold_start(args):
+    """가짜 account-interlock/토큰 엔드포인트를 띄우고, 새 프로세스가 브라우저 없이 토큰을 받기까지 걸린 시간을 잽니다."""
+    from aiohttp import web
+
+    async def interlock(request):
+        # 실제 서버처럼 redirectUri로 임시 코드와 state를 돌려보냄
+        query = request.query
+        raise web.HTTPFound(f"{query['redirectUri']}?code=bench-code&state={query['state']}")
+
+    async def token(request):
+        body = await request.json()
+        if body.get("grantType") != "authorization_code" or body.get("code") != "bench-code":
+            return web.json_response({"code": 400}, status=400)
+        return web.json_response({"code": 200, "content": {"accessToken": "bench-access", "refreshToken": "bench-refresh", "expiresIn": 86400}})
+
+    app = web.Application()
+    app.router.add_get("/account-interlock", interlock)
+    app.router.add_post("/auth/v1/token", token)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    base_url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    samples = []
+    try:
+        for _ in range(args.startup_runs):
+            spawned = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_profile.py"),
+                "ingest", "--full-auth", base_url,
+                stdout=asyncio.subprocess.PIPE, env={**os.environ, "LOG_LEVEL": "WARNING"}
+            )
+            line = await process.stdout.readline()
+            elapsed = time.perf_counter() - spawned
+            await process.wait()
+            result = json.loads(line)
+            result["wall_seconds"] = elapsed
+            samples.append(result)
+    finally:
+        await runner.cleanup()
+
+    median = lambda key: sorted(sample[key] for sample in samples)[len(samples) // 2]
+    print(f"토큰 발급 성공 {sum(sample['issued'] for sample in samples)}/{len(samples)}회")
+    print(f"프로세스 시작부터 토큰까지 {median('wall_seconds') * 1000:.0f}ms (import {median('import_seconds') * 1000:.0f}ms, "
+          f"인증 {median('auth_seconds') * 1000:.0f}ms), RSS {median('rss') / 1024 / 1024:.1f}MiB")
+    print(f"Selenium 로드: {any(sample['selenium_loaded'] for sample in samples)}, aiohttp.web 로드: {all(sample['web_loaded'] for sample in samples)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="치지직-디스코드 인증 파이프라인 부하 측정")
+    parser.add_argument("--rate", type=float, default=2000, help="초당 채팅 메시지 수")
+    parser.add_argument("--duration", type=float, default=5, help="측정 시간(초)")
+    parser.add_argument("--batch", type=int, default=10, help="웹소켓 프레임 하나에 담을 메시지 수")
+    parser.add_argument("--valid-share", type=float, default=0.01, help="발급된 인증 코드인 메시지의 비율")
+    parser.add_argument("--discord-latency", type=float, default=0.2, help="가짜 디스코드 멤버 수정 요청 지연(초)")
+    parser.add_argument("--workers", type=int, default=4, help="인증 작업 워커 수")
+    parser.add_argument("--queue-size", type=int, default=1000, help="인증 작업 큐 크기")
+    parser.add_argument("--max-pending", type=int, default=100000, help="미리 발급할 인증 코드 최대 개수")
+    parser.add_argument("--spam-share", type=float, default=0, help="무작위 6자리 숫자 도배 채팅의 비율")
+    parser.add_argument("--spammers", type=int, default=20, help="도배하는 사용자 수")
+    parser.add_argument("--no-throttle", action="store_true", help="사용자별 코드 입력 속도 제한 끄기 (비교용)")
+    parser.add_argument("--codec", choices=["orjson", "msgspec", "json"], help="채팅 프레임 디코딩 코덱")
+    parser.add_argument("--shared-store", help="프로세스 분리 모드의 공유 저장소 경로로 측정 (memory:// 또는 redis://...)")
+    parser.add_argument("--replay", help="재생할 채팅 로그 파일 (한 줄에 웹소켓 프레임 JSON 하나)")
+    parser.add_argument("--reconcile-members", type=int, help="채팅 대신 가짜 서버 멤버 수만큼 역할 재검증 작업을 측정")
+    parser.add_argument("--startup", choices=["all", "ingest", "discord"], help="채팅 대신 해당 역할의 시작 시간(첫 채팅 프레임까지)과 RSS를 측정")
+    parser.add_argument("--startup-runs", type=int, default=5, help="--startup 측정 반복 횟수 (중앙값 출력)")
+    parser.add_argument("--pending-expiry", type=int, help="채팅 대신 인증 대기 n건의 만료 처리 방식별 메모리를 비교")
+    parser.add_argument("--channels", type=int, help="치지직 채널(서버) n개를 동시에 수신할 때의 채널당 메모리와 처리량을 측정")
+    parser.add_argument("--make-replay", metavar="PATH", help="--messages건의 재생용 채팅 로그를 만들고 종료")
+    parser.add_argument("--messages", type=int, default=100000, help="--make-replay / --compare-codecs에서 만들 채팅 메시지 수")
+    parser.add_argument("--compare-codecs", action="store_true", help="같은 채팅 로그(--replay 또는 새로 생성)로 설치된 코덱별 수신 처리 속도를 비교")
+    parser.add_argument("--pending-lookup", action="store_true", help="채팅 대신 인증 대기 건수별 코드 조회 비용을 측정")
+    parser.add_argument("--lookups", type=int, default=100000, help="--pending-lookup에서 건수마다 조회할 횟수")
+    parser.add_argument("--auth-cold-start", action="store_true", help="가짜 치지직 인증 서버로 새 프로세스의 브라우저 없는 전체 인증 시간을 측정 (--startup-runs회)")
+    args = parser.parse_args()
+    if args.auth_cold_start:
+        asyncio.run(run_auth_cold_start(args))
+    elif args.pending_lookup:
+        run_pending_lookup(args)
+    elif args.make_replay:
+        generate_replay(args.make_replay, args.messages, args.batch)
+        print(f"{args.make_replay}: 채팅 {args.messages}건")
+    elif args.compare_codecs:
+        asyncio.run(run_codecs(args))
+    elif args.channels:
+        asyncio.run(run_channels(args))
+    elif args.pending_expiry:
+        asyncio.run(run_pending_expiry(args))
+    elif args.startup:
+        asyncio.run(run_startup(args))
+    elif args.reconcile_members:
+        setup_logging("WARNING")
+        asyncio.run(run_reconcile(args))
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# channel_manager.py
+import asyncio
+import logging
+from chzzk_api import ChzzkAPI, ChzzkAuth
+from chat_throttle import ChatThrottle
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelRoute:
+    """치지직 채널 하나가 인증 코드를 넘겨줄 디스코드 서버와 역할, 그리고 그 서버의 인증 공지 채널입니다."""
+    __slots__ = ("chzzk_channel_id", "guild_id", "role_id", "auth_channel_id")
+
+    def __init__(self, chzzk_channel_id, guild_id, role_id, auth_channel_id=None):
+        self.chzzk_channel_id = chzzk_channel_id
+        self.guild_id = int(guild_id)
+        self.role_id = int(role_id)
+        self.auth_channel_id = int(auth_channel_id) if auth_channel_id else None
+
+
+def parse_routes(spec):
+    """"치지직채널ID:서버ID:역할ID[:인증채널ID],..." 형식의 CHZZK_CHANNEL_ROUTES 값을 해석합니다."""
+    routes = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        parts = item.split(":")
+        if len(parts) not in (3, 4):
+            raise ValueError(f"잘못된 채널 라우팅 형식입니다: '{item}' (치지직채널ID:서버ID:역할ID[:인증채널ID])")
+        routes.append(ChannelRoute(*parts))
+    return routes
+
+
+class ChzzkChannelManager:
+    """여러 치지직 채널의 채팅 웹소켓을 한 이벤트 루프에서 동시에 수신합니다.
+
+    모든 채널이 하나의 ChzzkAuth(토큰, HTTP 커넥션 풀)를 공유합니다.
+    """
+
+    def __init__(self, routes, nid_aut=None, nid_ses=None):
+        self.auth = ChzzkAuth(nid_aut, nid_ses)
+        self.routes = {route.chzzk_channel_id: route for route in routes}
+        self.guild_routes = {}  # {guild_id: ChannelRoute} 같은 서버에 여러 채널이 연결되면 첫 번째 라우팅의 역할을 사용
+        self.auth_channels = {}  # {guild_id: 인증 공지 채널 ID} 서버마다 처음 지정된 채널 하나
+        for route in routes:
+            self.guild_routes.setdefault(route.guild_id, route)
+            if route.auth_channel_id:
+                self.auth_channels.setdefault(route.guild_id, route.auth_channel_id)
+        self.apis = {channel_id: ChzzkAPI(channel_id, auth=self.auth) for channel_id in self.routes}
+        # 한 사용자가 여러 채널에 코드를 나눠 입력해도 같은 버킷으로 제한
+        self.set_chat_throttle(ChatThrottle.from_env())
+
+    def get_api(self, channel_id):
+        return self.apis.get(channel_id)
+
+    def route_for_guild(self, guild_id):
+        return self.guild_routes.get(guild_id)
+
+    async def initialize(self):
+        await self.auth.get_access_token()
+        if not self.auth.access_token:
+            logger.error("초기 토큰 발급에 실패하여 봇을 시작할 수 없습니다.")
+            return
+        self.auth.start()
+        await asyncio.gather(*(api.initialize() for api in self.apis.values()))
+        logger.info("치지직 채널 %d개를 초기화했습니다.", len(self.apis))
+
+    def set_on_auth_message_callback(self, callback):
+        for api in self.apis.values():
+            api.set_on_auth_message_callback(callback)
+
+    def set_pending_code_filter(self, code_filter):
+        for api in self.apis.values():
+            api.set_pending_code_filter(code_filter)
+
+    def set_chat_throttle(self, throttle):
+        for api in self.apis.values():
+            api.set_chat_throttle(throttle)
+
+    async def listen_chat(self):
+        await asyncio.gather(*(api.listen_chat() for api in self.apis.values()))
+
+    async def close(self):
+        await asyncio.gather(*(api.close() for api in self.apis.values()), return_exceptions=True)
+        await self.auth.close()
+        logger.info("ChzzkAPI 세션을 종료했습니다.")
@@ -0,0 +1,125 @@
+# chat_dispatcher.py
+import asyncio
+import logging
+import time
+from instrumentation import CHAT_DISPATCH_DEPTH, CHAT_SEND_LATENCY, CHAT_SENDS
+
+logger = logging.getLogger(__name__)
+
+CHAT_MAX_LENGTH = 100  # 치지직 채팅 한 줄 최대 길이
+CONFIRM_SUFFIX = "님 디스코드 연동 인증이 완료되었습니다!"
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate  # 초당 충전되는 토큰 수
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def pause(self, seconds):
+        """429 Retry-After를 받았을 때 해당 시간 동안 토큰 발급을 멈춥니다."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ChatDispatcher:
+    """인증 완료 안내 채팅을 짧은 구간 동안 모아 한 메시지로 보내고, 치지직 API 속도 제한을 지킵니다."""
+
+    def __init__(self, chzzk_api, window=1.5, rate=0.5, burst=3, max_retries=3):
+        self.chzzk_api = chzzk_api
+        self.window = window
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.queue = asyncio.Queue()
+        self.task = None
+        self.stats = {"enqueued": 0, "messages_sent": 0, "send_failed": 0, "rate_limited": 0, "last_latency": 0.0, "max_latency": 0.0}
+
+    def start(self):
+        CHAT_DISPATCH_DEPTH.labels(self.chzzk_api.channel_id).set_function(self.queue.qsize)
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    def confirm(self, nickname):
+        self.queue.put_nowait((nickname, time.monotonic()))
+        self.stats["enqueued"] += 1
+
+    @staticmethod
+    def build_messages(nicknames):
+        messages, names = [], []
+        for nickname in nicknames:
+            candidate = names + [f"\"{nickname}\""]
+            if names and len(", ".join(candidate)) + len(CONFIRM_SUFFIX) > CHAT_MAX_LENGTH:
+                messages.append(", ".join(names) + CONFIRM_SUFFIX)
+                candidate = [f"\"{nickname}\""]
+            names = candidate
+        if names:
+            messages.append(", ".join(names) + CONFIRM_SUFFIX)
+        return messages
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            await asyncio.sleep(self.window)
+            while not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            oldest = min(enqueued_at for _, enqueued_at in batch)
+            for message in self.build_messages([nickname for nickname, _ in batch]):
+                try:
+                    await self._send(message)
+                except Exception as e:
+                    self.stats["send_failed"] += 1
+                    CHAT_SENDS.labels("error").inc()
+                    logger.warning("인증 완료 채팅 전송 중 오류 발생: error=%s", e)
+                latency = time.monotonic() - oldest
+                CHAT_SEND_LATENCY.observe(latency)
+                self.stats["last_latency"] = latency
+                self.stats["max_latency"] = max(self.stats["max_latency"], latency)
+
+    async def _send(self, message):
+        for _ in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            response = await self.chzzk_api.send_chat(message)
+            if response is None:
+                self.stats["send_failed"] += 1
+                CHAT_SENDS.labels("unavailable").inc()
+                return
+            if response.status_code != 429:
+                if response.status_code == 200:
+                    self.stats["messages_sent"] += 1
+                    CHAT_SENDS.labels("sent").inc()
+                else:
+                    self.stats["send_failed"] += 1
+                    CHAT_SENDS.labels("failed").inc()
+                return
+            self.stats["rate_limited"] += 1
+            CHAT_SENDS.labels("rate_limited").inc()
+            try:
+                retry_after = float(response.headers.get("Retry-After", 1))
+            except ValueError:
+                retry_after = 1.0
+            self.bucket.pause(retry_after)
+        self.stats["send_failed"] += 1
+        CHAT_SENDS.labels("failed").inc()
+        logger.warning("치지직 채팅 전송이 속도 제한으로 계속 실패했습니다: %s", message)
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
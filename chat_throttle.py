@@ -0,0 +1,46 @@
+# chat_throttle.py
+import collections
+import os
+import time
+
+
+class ChatThrottle:
+    """치지직 사용자(uid)별 토큰 버킷으로 인증 코드 형태의 채팅을 제한합니다.
+
+    버킷은 최근 사용자 max_users명만 LRU로 보관하므로 사용자가 많아도 메모리가 일정합니다.
+    한 사용자가 코드를 연달아 입력하면 rate(초당) 속도로만 인증 코드 조회에 전달되어,
+    무작위 숫자를 쏟아내 남의 코드를 맞히거나 조회 비용을 키우는 것을 막습니다.
+    """
+
+    def __init__(self, rate=0.1, burst=3, max_users=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets = collections.OrderedDict()  # {uid: [남은 토큰, 마지막 갱신 시각]}
+
+    @classmethod
+    def from_env(cls):
+        """CHZZK_CODE_RATE(분당 허용 횟수, 0이면 비활성화)와 CHZZK_CODE_BURST로 만듭니다."""
+        per_minute = float(os.getenv("CHZZK_CODE_RATE", "6"))
+        if per_minute <= 0:
+            return None
+        return cls(rate=per_minute / 60, burst=int(os.getenv("CHZZK_CODE_BURST", "3")))
+
+    def allow(self, uid, now=None):
+        if uid is None:
+            return True
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(uid)
+        if bucket is None:
+            if len(self._buckets) >= self.max_users:
+                self._buckets.popitem(last=False)
+            self._buckets[uid] = [self.burst - 1, now]
+            return True
+        self._buckets.move_to_end(uid)
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
@@ -1,39 +1,242 @@
 # chzzk_api.py
-import requests
+import aiohttp
 import asyncio
+import logging
 import websockets
 import json
 import time
 import random
+import re
 import string
 from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from typing import List, Optional
 from dotenv import set_key, load_dotenv
 import os
-from urllib.parse import urlparse, parse_qs
+from http.cookies import SimpleCookie
+from urllib.parse import urlparse, parse_qs, urlencode
+from state_store import atomic_write
+from chat_throttle import ChatThrottle
+from instrumentation import CHAT_FRAMES, CHAT_MESSAGES, CHAT_RECONNECTS, TOKEN_REFRESHES
+
+logger = logging.getLogger(__name__)
 
 TOKEN_CACHE_FILE = ".chzzk_token_cache.json"
+AUTH_CODE_PATTERN = re.compile(r"[0-9]{6}")
+HTTP_TIMEOUT = 10  # 초
+HTTP_POOL_SIZE = 20
+AUTH_REDIRECT_URI = "http://localhost:8080"
+TOKEN_URL = "https://openapi.chzzk.naver.com/auth/v1/token"
+ACCOUNT_INTERLOCK_URL = "https://chzzk.naver.com/account-interlock"
+TOKEN_MIN_VALIDITY = timedelta(minutes=10)  # 남은 유효 시간이 이보다 짧으면 요청 시점에 재발급
+TOKEN_REFRESH_AHEAD = timedelta(minutes=30)  # 백그라운드 재발급은 만료 30분 전에 미리 수행
+TOKEN_LEASE_NAME = "token-refresh"
+TOKEN_LEASE_SECONDS = 120  # 전체 인증(브라우저 로그인)까지 끝낼 수 있는 시간
+TOKEN_LEASE_POLL_INTERVAL = 0.5
+TOKEN_REJECTED_STATUSES = (400, 401)  # Refresh Token 자체가 거부된 응답 (invalid_grant 등). 이때만 토큰을 버림
+CHAT_SERVER_COUNT = 9  # kr-ss1 ~ kr-ss9
+CHAT_CONNECT_TIMEOUT = 5
+CHAT_PING_INTERVAL = 20
+CHAT_RECV_TIMEOUT = 60
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 30
 
-class ChzzkAPI:
-    def __init__(self, channel_id, nid_aut, nid_ses):
+
+class RedirectCatcher:
+    """치지직 로그인 리디렉션(localhost:8080)을 받아 code/state를 넘겨주는 작은 로컬 서버입니다."""
+
+    def __init__(self, host="localhost", port=8080):
+        self.host, self.port = host, port
+        self.runner = None
+        self.result = None
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        if not self.result.done():
+            self.result.set_result(dict(request.query))
+        return web.Response(text="치지직 인증이 완료되었습니다. 이 창을 닫아도 됩니다.", content_type="text/plain", charset="utf-8")
+
+    async def __aenter__(self):
+        # aiohttp.web은 전체 인증 절차에서만 필요하므로 이때 불러옴
+        from aiohttp import web
+
+        self.result = asyncio.get_running_loop().create_future()
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self._handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        try:
+            await web.TCPSite(self.runner, self.host, self.port).start()
+        except OSError as e:
+            # 포트를 쓸 수 없어도 Selenium 경로는 브라우저 URL에서 코드를 읽을 수 있음
+            logger.warning("리디렉션 수신 서버를 시작할 수 없습니다 (%s:%s): %s", self.host, self.port, e)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+class ChatServerSelector:
+    """채팅 서버별 연결 소요 시간을 기록해 두고, 빠르게 응답한 서버를 우선 선택합니다."""
+
+    def __init__(self, count=CHAT_SERVER_COUNT, explore=0.1):
+        self.servers = list(range(1, count + 1))
+        self.explore = explore  # 다른 서버도 가끔 측정하기 위해 무작위로 고르는 비율
+        self.latency = {}  # {server: 연결 시간 지수이동평균(초)}
+
+    @staticmethod
+    def uri(server):
+        return f"wss://kr-ss{server}.chat.naver.com/chat"
+
+    def choose(self):
+        unmeasured = [server for server in self.servers if server not in self.latency]
+        if unmeasured and (not self.latency or random.random() < self.explore):
+            return random.choice(unmeasured)
+        if random.random() < self.explore:
+            return random.choice(self.servers)
+        return min(self.latency, key=self.latency.get)
+
+    def record_success(self, server, seconds):
+        previous = self.latency.get(server)
+        self.latency[server] = seconds if previous is None else previous * 0.7 + seconds * 0.3
+
+    def record_failure(self, server):
+        # 실패한 서버는 한동안 선택되지 않도록 큰 지연으로 기록
+        self.record_success(server, CHAT_CONNECT_TIMEOUT * 2)
+
+
+class StdlibChatCodec:
+    """채팅 프레임 인코딩/디코딩. 인증에 필요한 cmd, msg, nickname만 꺼냅니다."""
+    name = "json"
+
+    def _loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def decode_frame(self, data):
+        """(cmd, [(msg, profile, uid), ...]) 를 반환합니다. 채팅 프레임(93101)이 아니면 목록은 None입니다."""
+        message = self._loads(data)
+        cmd = message.get("cmd")
+        if cmd != 93101:
+            return cmd, None
+        return cmd, [(item.get("msg"), item.get("profile"), item.get("uid")) for item in message.get("bdy") or ()]
+
+    def nickname(self, profile):
+        return self._loads(profile).get("nickname") if profile else None
+
+
+class OrjsonChatCodec(StdlibChatCodec):
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._loads = orjson.loads
+        self._orjson_dumps = orjson.dumps
+
+    def dumps(self, obj):
+        return self._orjson_dumps(obj).decode()
+
+
+class MsgspecChatCodec(StdlibChatCodec):
+    """필요한 필드만 정의한 Struct로 디코딩하여 나머지 필드는 파싱하지 않습니다."""
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        class Frame(msgspec.Struct):
+            cmd: int = -1
+            bdy: msgspec.Raw = msgspec.Raw(b"null")  # 채팅 프레임일 때만 목록으로 다시 디코딩
+
+        class ChatItem(msgspec.Struct):
+            msg: Optional[str] = None
+            profile: Optional[str] = None
+            uid: Optional[str] = None
+
+        class Profile(msgspec.Struct):
+            nickname: Optional[str] = None
+
+        self._encoder = msgspec.json.Encoder()
+        self._frame_decoder = msgspec.json.Decoder(Frame)
+        self._items_decoder = msgspec.json.Decoder(Optional[List[ChatItem]])
+        self._profile_decoder = msgspec.json.Decoder(Profile)
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj).decode()
+
+    def decode_frame(self, data):
+        frame = self._frame_decoder.decode(data)
+        if frame.cmd != 93101:
+            return frame.cmd, None
+        return frame.cmd, [(item.msg, item.profile, item.uid) for item in self._items_decoder.decode(frame.bdy) or ()]
+
+    def nickname(self, profile):
+        return self._profile_decoder.decode(profile).nickname if profile else None
+
+
+CHAT_CODECS = {"orjson": OrjsonChatCodec, "msgspec": MsgspecChatCodec, "json": StdlibChatCodec}  # 자동 선택 우선순위 순
+
+
+def get_chat_codec(name=None):
+    """지정한 코덱(CHZZK_JSON_CODEC)을 쓰거나, 설치된 것 중 가장 빠른 코덱을 고릅니다. (orjson > msgspec > json)
+
+    알 수 없는 이름이거나 지정한 코덱이 설치되어 있지 않으면 표준 json을 사용합니다.
+    """
+    name = name or os.getenv("CHZZK_JSON_CODEC")
+    if name and name not in CHAT_CODECS:
+        logger.warning("알 수 없는 채팅 코덱 '%s'입니다. (사용 가능: %s) 표준 json을 사용합니다.", name, ", ".join(CHAT_CODECS))
+        return StdlibChatCodec()
+    for candidate in ([name] if name else CHAT_CODECS):
+        try:
+            return CHAT_CODECS[candidate]()
+        except ImportError:
+            continue
+    return StdlibChatCodec()
+
+
+class HttpResponse:
+    """aiohttp 응답을 본문까지 읽어 둔 결과입니다. (커넥션은 즉시 풀로 반환됨)"""
+
+    def __init__(self, status_code, text, headers):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ChzzkAuth:
+    """치지직 Open API 토큰과 HTTP 커넥션 풀을 보관합니다. 여러 채널의 ChzzkAPI가 하나를 공유할 수 있습니다."""
+
+    def __init__(self, nid_aut=None, nid_ses=None):
         load_dotenv()
-        self.channel_id = channel_id
         self.nid_aut = nid_aut or os.getenv("NID_AUT")
         self.nid_ses = nid_ses or os.getenv("NID_SES")
         self.client_id = os.getenv("CHZZK_CLIENT_ID")
         self.client_secret = os.getenv("CHZZK_CLIENT_SECRET")
         self.headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"}
         self.access_token, self.refresh_token, self.token_expiry_time = None, None, None
-        self.chat_channel_id, self.websocket, self.on_auth_message_callback = None, None, None
-        self.session = requests.Session()
-        self.is_listening = False
+        self.session = None  # aiohttp.ClientSession은 이벤트 루프 안에서 생성해야 하므로 첫 요청 시 생성
+        self._refresh_task = None  # 진행 중인 재발급 (동시에 들어온 요청은 이 작업 하나를 함께 기다림)
+        self._refresh_loop_task = None
+        self.shared_store, self.lease_owner = None, None
         self._load_tokens_from_cache()
 
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, keepalive_timeout=60)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT))
+        return self.session
+
+    async def request(self, method, url, timeout=None, **kwargs):
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        async with self._get_session().request(method, url, **kwargs) as response:
+            return HttpResponse(response.status, await response.text(), response.headers)
+
     def _load_tokens_from_cache(self):
         if os.path.exists(TOKEN_CACHE_FILE):
             try:
@@ -41,60 +244,236 @@ class ChzzkAPI:
                     data = json.load(f)
                 self.access_token, self.refresh_token = data.get("accessToken"), data.get("refreshToken")
                 self.token_expiry_time = datetime.fromisoformat(data.get("expiryTime"))
-                print("캐시에서 토큰을 성공적으로 불러왔습니다.")
+                logger.info("캐시에서 토큰을 성공적으로 불러왔습니다.")
             except (json.JSONDecodeError, KeyError, TypeError) as e:
-                print(f"토큰 캐시 파일 로딩 오류: {e}. 캐시를 무시합니다.")
+                logger.warning("토큰 캐시 파일 로딩 오류: %s. 캐시를 무시합니다.", e)
                 self.access_token, self.refresh_token, self.token_expiry_time = None, None, None
 
+    def _token_json(self):
+        return json.dumps({"accessToken": self.access_token, "refreshToken": self.refresh_token, "expiryTime": self.token_expiry_time.isoformat()})
+
     def _save_tokens_to_cache(self):
         if all([self.access_token, self.refresh_token, self.token_expiry_time]):
-            data = {"accessToken": self.access_token, "refreshToken": self.refresh_token, "expiryTime": self.token_expiry_time.isoformat()}
-            with open(TOKEN_CACHE_FILE, "w") as f:
-                json.dump(data, f)
-            print("파일에 새로운 토큰을 캐시했습니다.")
+            atomic_write(TOKEN_CACHE_FILE, self._token_json())
+            logger.info("파일에 새로운 토큰을 캐시했습니다.")
 
-    async def initialize(self):
-        await self.get_access_token()
-        if not self.access_token:
-            print("초기 토큰 발급에 실패하여 봇을 시작할 수 없습니다.")
-            return
-        self.chat_channel_id = await self.get_chat_channel_id()
+    def _token_expired(self):
+        return not self.token_expiry_time or self.token_expiry_time <= datetime.now()
+
+    def has_valid_token(self):
+        return bool(self.access_token and self.token_expiry_time and (self.token_expiry_time - datetime.now() > TOKEN_MIN_VALIDITY))
 
     async def get_access_token(self, verbose=True):
-        if self.access_token and self.token_expiry_time and (self.token_expiry_time - datetime.now() > timedelta(minutes=10)):
-            if verbose: print("캐시된 액세스 토큰이 아직 유효합니다.")
+        # 유효한 토큰이 있으면 네트워크 대기 없이 바로 반환
+        if self.has_valid_token():
+            if verbose: logger.debug("캐시된 액세스 토큰이 아직 유효합니다.")
+            return
+        await self._single_flight_refresh(verbose)
+
+    def _single_flight_refresh(self, verbose, ahead=False):
+        # 동시에 여러 곳에서 재발급을 요청해도 Refresh Token 사용은 한 번만 일어나도록 함
+        # (한 요청이 갱신한 Refresh Token을 다른 요청이 무효화하는 문제 방지)
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._ensure_access_token(verbose, ahead))
+        return asyncio.shield(self._refresh_task)
+
+    def start(self):
+        """만료 전에 미리 토큰을 재발급하는 백그라운드 작업을 시작합니다."""
+        if self._refresh_loop_task is None:
+            self._refresh_loop_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            if self.token_expiry_time:
+                delay = (self.token_expiry_time - TOKEN_REFRESH_AHEAD - datetime.now()).total_seconds()
+            else:
+                delay = 0
+            await asyncio.sleep(max(delay, 60))
+            if self.token_expiry_time and self.token_expiry_time - datetime.now() > TOKEN_REFRESH_AHEAD:
+                continue
+            try:
+                await self._single_flight_refresh(verbose=False, ahead=True)
+            except Exception as e:
+                logger.warning("백그라운드 토큰 재발급 중 오류 발생: %s", e)
+
+    def set_shared_store(self, store, owner):
+        """프로세스를 나눠 실행할 때 토큰을 공유 저장소로 주고받고, 재발급은 임대를 얻은 프로세스 하나만 하도록 합니다."""
+        self.shared_store, self.lease_owner = store, owner
+
+    def _token_fresh(self, ahead):
+        if ahead:
+            return bool(self.access_token and self.token_expiry_time and self.token_expiry_time - datetime.now() > TOKEN_REFRESH_AHEAD)
+        return self.has_valid_token()
+
+    async def _adopt_shared_token(self):
+        """공유 저장소의 토큰이 가진 것보다 새것이면 가져옵니다."""
+        raw = await self.shared_store.load_token()
+        if not raw:
+            return False
+        data = json.loads(raw)
+        expiry_time = datetime.fromisoformat(data["expiryTime"])
+        if self.token_expiry_time and expiry_time <= self.token_expiry_time:
+            return False
+        self.access_token, self.refresh_token, self.token_expiry_time = data["accessToken"], data["refreshToken"], expiry_time
+        self._save_tokens_to_cache()
+        return True
+
+    async def _ensure_access_token(self, verbose, ahead=False):
+        if self.shared_store is None:
+            await self._refresh_tokens(verbose, ahead)
+            return
+        await self._adopt_shared_token()
+        if self._token_fresh(ahead):
+            return
+        if not await self.shared_store.acquire_lease(TOKEN_LEASE_NAME, self.lease_owner, TOKEN_LEASE_SECONDS):
+            # 다른 프로세스가 재발급 중이면 Refresh Token을 쓰지 않고 그 결과를 기다림
+            deadline = time.monotonic() + TOKEN_LEASE_SECONDS
+            while time.monotonic() < deadline:
+                await asyncio.sleep(TOKEN_LEASE_POLL_INTERVAL)
+                if await self._adopt_shared_token() or self._token_fresh(ahead):
+                    return
+            logger.warning("다른 프로세스의 토큰 재발급을 기다리다 시간이 초과되었습니다.")
+            return
+        try:
+            # 임대를 얻기 직전에 다른 프로세스가 재발급을 마쳤을 수 있음
+            if await self._adopt_shared_token() and self._token_fresh(ahead):
+                return
+            previous = self.access_token
+            await self._refresh_tokens(verbose, ahead)
+            if self.access_token and self.access_token != previous:
+                await self.shared_store.save_token(self._token_json())
+        finally:
+            await self.shared_store.release_lease(TOKEN_LEASE_NAME, self.lease_owner)
+
+    async def _refresh_tokens(self, verbose, ahead):
+        if not ahead and self.has_valid_token():
             return
         if self.refresh_token:
-            if verbose: print("액세스 토큰이 만료되어 Refresh Token으로 재발급을 시도합니다.")
+            if verbose: logger.info("액세스 토큰이 만료되어 Refresh Token으로 재발급을 시도합니다.")
             if await self._refresh_with_refresh_token():
                 return
+        if ahead or (self.refresh_token and not self._token_expired()):
+            # 미리 재발급은 Refresh Token으로만 시도하고, 일시적 오류로 실패했다면 토큰이 만료되기 전까지는 다음 요청 때 다시 시도
+            return
 
-        if verbose: print("유효한 Refresh Token이 없거나 재발급에 실패하여, 전체 인증을 시작합니다.")
+        if verbose: logger.warning("유효한 Refresh Token이 없거나 재발급에 실패하여, 전체 인증을 시작합니다.")
         await self._get_token_with_auth_code()
 
     async def _refresh_with_refresh_token(self):
-        print("[*] Refresh Token 사용...")
-        token_url = "https://openapi.chzzk.naver.com/auth/v1/token"
+        logger.info("[*] Refresh Token 사용...")
+        token_url = TOKEN_URL
         payload = {"grantType": "refresh_token", "refreshToken": self.refresh_token, "clientId": self.client_id, "clientSecret": self.client_secret}
-        response = await asyncio.get_event_loop().run_in_executor(None, lambda: self.session.post(token_url, json=payload))
+        try:
+            response = await self.request("POST", token_url, json=payload)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # 요청이 서버에 닿지 않았으므로 Refresh Token은 그대로 두고 다음에 다시 시도
+            TOKEN_REFRESHES.labels("refresh_token", "failure").inc()
+            logger.warning("Refresh Token 요청 중 네트워크 오류: %s", e)
+            return False
         if response.status_code == 200:
             content = response.json().get("content", {})
             self.access_token, self.refresh_token = content.get("accessToken"), content.get("refreshToken")
             self.token_expiry_time = datetime.now() + timedelta(seconds=content.get("expiresIn", 86400))
             self._save_tokens_to_cache()
-            print("Refresh Token을 사용하여 액세스 토큰 재발급 성공.")
+            TOKEN_REFRESHES.labels("refresh_token", "success").inc()
+            logger.info("Refresh Token을 사용하여 액세스 토큰 재발급 성공.")
             return True
         else:
-            print(f"Refresh Token 사용 실패: {response.status_code}, {response.text}")
-            self.access_token, self.refresh_token, self.token_expiry_time = None, None, None
-            if os.path.exists(TOKEN_CACHE_FILE):
-                os.remove(TOKEN_CACHE_FILE)
+            TOKEN_REFRESHES.labels("refresh_token", "failure").inc()
+            logger.warning("Refresh Token 사용 실패: status=%s body=%s", response.status_code, response.text)
+            # 일시적인 오류(5xx, 429 등)이고 토큰이 아직 만료되지 않았다면 토큰과 캐시를 유지하고 나중에 다시 시도
+            if response.status_code in TOKEN_REJECTED_STATUSES or self._token_expired():
+                self.access_token, self.refresh_token, self.token_expiry_time = None, None, None
+                if os.path.exists(TOKEN_CACHE_FILE):
+                    os.remove(TOKEN_CACHE_FILE)
             return False
 
     async def _get_token_with_auth_code(self):
-        print("[*] 전체 인증 절차 시작 (Selenium 사용)...")
+        try:
+            await self._issue_token_with_auth_code()
+        finally:
+            TOKEN_REFRESHES.labels("auth_code", "success" if self.has_valid_token() else "failure").inc()
+
+    async def _issue_token_with_auth_code(self):
+        logger.info("[*] 전체 인증 절차 시작...")
         if not self.client_id or not self.client_secret:
-            print("오류: .env 파일에 CHZZK_CLIENT_ID 또는 CHZZK_CLIENT_SECRET이 없습니다."); return
+            logger.error(".env 파일에 CHZZK_CLIENT_ID 또는 CHZZK_CLIENT_SECRET이 없습니다."); return
+
+        # auto: 쿠키가 있으면 브라우저 없이 HTTP로 시도하고, 실패하면 Selenium 사용
+        mode = os.getenv("CHZZK_AUTH_MODE", "auto")
+        state = ''.join(random.choices(string.ascii_letters + string.digits, k=16))
+        params = {"clientId": self.client_id, "redirectUri": AUTH_REDIRECT_URI, "state": state}
+        interlock_url = f"{ACCOUNT_INTERLOCK_URL}?{urlencode(params)}"
+
+        query = None
+        try:
+            redirect = urlparse(AUTH_REDIRECT_URI)
+            async with RedirectCatcher(redirect.hostname, redirect.port or 80) as catcher:
+                if mode != "selenium" and self.nid_aut and self.nid_ses:
+                    logger.info("[1/2] 브라우저 없이 임시 코드 발급 시도...")
+                    query = await self._get_auth_code_with_http(interlock_url, catcher)
+                if not query and mode != "http":
+                    logger.info("[1/2] Selenium으로 임시 코드 발급 시도...")
+                    query = await self._get_auth_code_with_selenium(interlock_url, catcher)
+        except Exception as e:
+            logger.warning("임시 코드 발급 과정 중 예외 발생: %s", e)
+            return
+
+        auth_code, returned_state = (query or {}).get("code"), (query or {}).get("state")
+        if not auth_code or returned_state != state:
+            logger.warning("리디렉션 URL에서 code 또는 state를 찾을 수 없습니다."); return
+        logger.info("임시 코드 발급 성공.")
+
+        logger.info("[2/2] 최종 액세스 토큰 발급 요청...")
+        token_url = TOKEN_URL
+        token_payload = {"grantType": "authorization_code", "clientId": self.client_id, "clientSecret": self.client_secret, "code": auth_code, "state": returned_state}
+        try:
+            response = await self.request("POST", token_url, json=token_payload)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("액세스 토큰 발급 요청 중 예외 발생: %s", e); return
+
+        if response.status_code == 200:
+            token_data = response.json()
+            content = token_data.get("content", {})
+            self.access_token, self.refresh_token = content.get("accessToken"), content.get("refreshToken")
+            self.token_expiry_time = datetime.now() + timedelta(seconds=content.get("expiresIn", 86400))
+            if self.access_token: self._save_tokens_to_cache(); logger.info("최종 액세스 토큰 발급 성공.")
+            else: logger.warning("액세스 토큰 발급 응답 오류: %s", token_data)
+        else:
+            logger.warning("액세스 토큰 발급 실패: status=%s body=%s", response.status_code, response.text)
+
+    async def _get_auth_code_with_http(self, interlock_url, catcher):
+        """NID_AUT/NID_SES 쿠키로 account-interlock 리디렉션을 따라가 AUTH_REDIRECT_URI의 RedirectCatcher에서 코드를 받습니다."""
+        cookies = SimpleCookie()
+        for name, value in (("NID_AUT", self.nid_aut), ("NID_SES", self.nid_ses)):
+            cookies[name] = value
+            cookies[name]["domain"] = ".naver.com"
+        jar = aiohttp.CookieJar()
+        jar.update_cookies(cookies)
+        try:
+            async with aiohttp.ClientSession(cookie_jar=jar, headers=self.headers, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)) as session:
+                async with session.get(interlock_url) as response:
+                    await response.read()
+            return await asyncio.wait_for(asyncio.shield(catcher.result), timeout=1)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("브라우저 없는 인증에 실패했습니다 (쿠키 만료 또는 동의 필요): %s", e)
+            return None
+
+    async def _get_auth_code_with_selenium(self, interlock_url, catcher):
+        # Selenium과 Chrome은 이 경로에서만 필요하므로 여기서 불러오고, 동기 WebDriver 호출은 스레드에서 실행
+        current_url = await asyncio.get_running_loop().run_in_executor(None, self._run_selenium_auth, interlock_url)
+        if catcher.result.done():
+            return catcher.result.result()
+        if not current_url:
+            return None
+        return {key: values[0] for key, values in parse_qs(urlparse(current_url).query).items()}
+
+    def _run_selenium_auth(self, interlock_url):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
 
         driver = None
         try:
@@ -105,99 +484,191 @@ class ChzzkAPI:
             if self.nid_aut and self.nid_ses:
                 driver.get("https://chzzk.naver.com/"); driver.add_cookie({"name": "NID_AUT", "value": self.nid_aut}); driver.add_cookie({"name": "NID_SES", "value": self.nid_ses})
             else:
-                print("쿠키 정보가 없습니다. 브라우저에서 로그인해주세요...")
+                logger.warning("쿠키 정보가 없습니다. 브라우저에서 로그인해주세요...")
                 driver.get("https://nid.naver.com/nidlogin.login")
                 WebDriverWait(driver, 120).until(lambda d: "nid.naver.com/nidlogin.login" not in d.current_url)
-                print("로그인 성공. 쿠키를 저장합니다.")
+                logger.info("로그인 성공. 쿠키를 저장합니다.")
                 for cookie in driver.get_cookies():
                     if cookie['name'] == 'NID_AUT': set_key(".env", "NID_AUT", cookie['value'])
                     if cookie['name'] == 'NID_SES': set_key(".env", "NID_SES", cookie['value'])
                 load_dotenv(override=True); self.nid_aut = os.getenv("NID_AUT"); self.nid_ses = os.getenv("NID_SES")
 
-            print("[1/2] Selenium으로 임시 코드 발급 시도...")
-            state = ''.join(random.choices(string.ascii_letters + string.digits, k=16))
-            req = requests.Request('GET', "https://chzzk.naver.com/account-interlock", params={"clientId": self.client_id, "redirectUri": "http://localhost:8080", "state": state})
-            driver.get(req.prepare().url)
-            WebDriverWait(driver, 30).until(EC.url_contains("http://localhost:8080"))
-
-            query_params = parse_qs(urlparse(driver.current_url).query)
-            auth_code, returned_state = query_params.get("code", [None])[0], query_params.get("state", [None])[0]
-            driver.quit()
-
-            if not auth_code or returned_state != state:
-                print(f"리디렉션 URL에서 code 또는 state를 찾을 수 없습니다."); return
-            print("임시 코드 발급 성공.")
-
-            print("[2/2] 최종 액세스 토큰 발급 요청...")
-            token_url = "https://openapi.chzzk.naver.com/auth/v1/token"
-            token_payload = {"grantType": "authorization_code", "clientId": self.client_id, "clientSecret": self.client_secret, "code": auth_code, "state": returned_state}
-            response = await asyncio.get_event_loop().run_in_executor(None, lambda: self.session.post(token_url, json=token_payload))
-
-            if response.status_code == 200:
-                token_data = response.json()
-                content = token_data.get("content", {})
-                self.access_token, self.refresh_token = content.get("accessToken"), content.get("refreshToken")
-                self.token_expiry_time = datetime.now() + timedelta(seconds=content.get("expiresIn", 86400))
-                if self.access_token: self._save_tokens_to_cache(); print("최종 액세스 토큰 발급 성공.")
-                else: print(f"액세스 토큰 발급 응답 오류: {token_data}")
-            else:
-                print(f"액세스 토큰 발급 실패: {response.status_code}, {response.text}")
+            driver.get(interlock_url)
+            WebDriverWait(driver, 30).until(EC.url_contains(AUTH_REDIRECT_URI))
+            return driver.current_url
         except Exception as e:
-            print(f"전체 토큰 발급 과정 중 예외 발생: {e}")
+            logger.warning("Selenium 인증 과정 중 예외 발생: %s", e)
+            return None
+        finally:
             if driver: driver.quit()
 
+    async def close(self):
+        if self._refresh_loop_task:
+            self._refresh_loop_task.cancel()
+            self._refresh_loop_task = None
+        if self.session and not self.session.closed: await self.session.close()
+
+
+class ChzzkAPI:
+    def __init__(self, channel_id, nid_aut=None, nid_ses=None, auth=None):
+        self.channel_id = channel_id
+        self.auth = auth or ChzzkAuth(nid_aut, nid_ses)
+        self._owns_auth = auth is None  # 공유받은 ChzzkAuth는 ChzzkChannelManager가 닫음
+        self.headers = self.auth.headers
+        self.chat_channel_id, self.websocket, self.on_auth_message_callback = None, None, None
+        self.is_listening = False
+        self.pending_code_filter = None  # 진행 중인 인증 코드인지 확인하는 함수 (code -> bool)
+        self.chat_throttle = ChatThrottle.from_env()  # uid별 코드 입력 속도 제한 (None이면 제한 없음)
+        self.chat_stats = {"seen": 0, "rejected": 0, "forwarded": 0, "throttled": 0}
+        # 핫 패스에서 라벨 조회를 반복하지 않도록 지표를 미리 받아 둠
+        self._frames_metric = CHAT_FRAMES.labels(channel_id)
+        self._seen_metric = CHAT_MESSAGES.labels(channel_id, "seen")
+        self._rejected_metric = CHAT_MESSAGES.labels(channel_id, "rejected")
+        self._forwarded_metric = CHAT_MESSAGES.labels(channel_id, "forwarded")
+        self._throttled_metric = CHAT_MESSAGES.labels(channel_id, "throttled")
+        self.server_selector = ChatServerSelector()
+        self.codec = get_chat_codec()
+        self.chat_server_uri = os.getenv("CHZZK_CHAT_SERVER_URI")  # 지정 시 kr-ss 서버 대신 사용 (테스트용 로컬 서버 등)
+
+    @property
+    def access_token(self):
+        return self.auth.access_token
+
+    async def get_access_token(self, verbose=True):
+        await self.auth.get_access_token(verbose=verbose)
+
+    async def _request(self, method, url, timeout=None, **kwargs):
+        return await self.auth.request(method, url, timeout=timeout, **kwargs)
+
+    async def initialize(self):
+        await self.get_access_token(verbose=self._owns_auth)
+        if not self.access_token:
+            logger.warning("초기 토큰 발급에 실패하여 봇을 시작할 수 없습니다.")
+            return
+        if self._owns_auth: self.auth.start()
+        self.chat_channel_id = await self.get_chat_channel_id()
+
     async def get_chat_channel_id(self):
         url = f"https://api.chzzk.naver.com/polling/v2/channels/{self.channel_id}/live-status"
-        response = await asyncio.get_event_loop().run_in_executor(None, lambda: self.session.get(url, headers=self.headers))
+        response = await self._request("GET", url, headers=self.headers)
         if response.status_code == 200 and response.json().get("code") == 200:
             return response.json().get("content", {}).get("chatChannelId")
-        print("채팅 채널 ID를 가져오는데 실패했습니다."); return None
+        logger.warning("채팅 채널 ID를 가져오는데 실패했습니다."); return None
 
     def set_on_auth_message_callback(self, callback): self.on_auth_message_callback = callback
 
+    def set_pending_code_filter(self, code_filter): self.pending_code_filter = code_filter
+
+    def set_chat_throttle(self, throttle): self.chat_throttle = throttle
+
     async def listen_chat(self):
         self.is_listening = True
         first_connection = True
+        failures = 0  # 연속 실패 횟수 (재연결 백오프 계산용)
         while self.is_listening:
-            await self.get_access_token(verbose=first_connection)
-            if not self.access_token: print("액세스 토큰이 없어 채팅 서버에 연결할 수 없습니다. 1분 후 재시도합니다."); await asyncio.sleep(60); continue
-            if not self.chat_channel_id: self.chat_channel_id = await self.get_chat_channel_id();
-            if not self.chat_channel_id: print("채팅 채널 ID가 없어 연결할 수 없습니다. 1분 후 재시도합니다."); await asyncio.sleep(60); continue
-            uri = f"wss://kr-ss{random.randint(1, 9)}.chat.naver.com/chat"
+            server = connected_at = None
+            reason = "closed"
             try:
-                async with websockets.connect(uri) as websocket:
+                # 토큰 재발급이나 채널 조회 중 네트워크 오류가 나도 리스너가 죽지 않고 아래 백오프로 재시도
+                await self.get_access_token(verbose=first_connection)
+                if not self.access_token: logger.warning("액세스 토큰이 없어 채팅 서버에 연결할 수 없습니다. 1분 후 재시도합니다."); await asyncio.sleep(60); continue
+                if not self.chat_channel_id: self.chat_channel_id = await self.get_chat_channel_id();
+                if not self.chat_channel_id: logger.warning("채팅 채널 ID가 없어 연결할 수 없습니다. 1분 후 재시도합니다."); await asyncio.sleep(60); continue
+
+                server = self.server_selector.choose()
+                uri = self.chat_server_uri or ChatServerSelector.uri(server)
+                started = time.monotonic()
+                async with websockets.connect(uri, open_timeout=CHAT_CONNECT_TIMEOUT, ping_interval=None) as websocket:
                     self.websocket = websocket
-                    await websocket.send(json.dumps({"ver": "3", "cmd": 100, "svcid": "game", "cid": self.chat_channel_id, "bdy": {"uid": None, "devType": 2001, "accTkn": self.access_token, "auth": "READ"}, "tid": 1}))
+                    await websocket.send(self.codec.dumps({"ver": "3", "cmd": 100, "svcid": "game", "cid": self.chat_channel_id, "bdy": {"uid": None, "devType": 2001, "accTkn": self.access_token, "auth": "READ"}, "tid": 1}))
+                    connected_at = time.monotonic()
+                    self.server_selector.record_success(server, connected_at - started)
+                    failures = 0
                     if first_connection:
-                        print("치지직 채팅 서버에 연결되었습니다.")
+                        logger.info("치지직 채팅 서버에 연결되었습니다. channel=%s", self.channel_id)
                         first_connection = False
-
-                    while self.is_listening:
-                        message_json = await asyncio.wait_for(websocket.recv(), timeout=60)
-                        message = json.loads(message_json)
-                        if message.get("cmd") == 10000: await websocket.send(json.dumps({"ver": "2", "cmd": 0}))
-                        elif message.get("cmd") == 93101:
-                            for msg_item in message.get("bdy", []):
-                                profile = json.loads(msg_item.get("profile", "{}"))
-                                if self.on_auth_message_callback: await self.on_auth_message_callback(profile.get("nickname"), msg_item.get("msg"))
+                    await self._receive_chat(websocket)
             except asyncio.TimeoutError:
-                print("웹소켓 PING 전송...");
-                try: await self.websocket.send(json.dumps({"ver": "2", "cmd": 0}))
-                except: pass
+                reason = "timeout"
+                if connected_at is None:
+                    logger.warning("채팅 서버 연결 준비 중 시간이 초과되어 다시 시도합니다. channel=%s", self.channel_id)
+                else:
+                    logger.warning("채팅 서버로부터 %d초 동안 응답이 없어 재연결합니다. channel=%s", CHAT_RECV_TIMEOUT, self.channel_id)
             except websockets.exceptions.ConnectionClosed as e:
                 if e.code != 1000:
-                    print(f"웹소켓 연결이 비정상적으로 종료되었습니다: {e}. 5초 후 재연결합니다.")
-                    await asyncio.sleep(5)
+                    reason = "abnormal_close"
+                    logger.warning("웹소켓 연결이 비정상적으로 종료되었습니다. 재연결합니다. channel=%s error=%s", self.channel_id, e)
                 # Normal closure (code 1000) will be silent and just loop to reconnect.
             except Exception as e:
-                print(f"채팅 리스닝 중 오류: {e}. 5초 후 재연결합니다.")
-                await asyncio.sleep(5)
+                reason = "error"
+                logger.warning("채팅 리스닝 중 오류가 발생해 재연결합니다. channel=%s error=%s", self.channel_id, e)
+
+            if server is not None and connected_at is None:
+                reason = "connect_failed"
+                self.server_selector.record_failure(server)
+            if not self.is_listening:
+                break
+            CHAT_RECONNECTS.labels(self.channel_id, reason).inc()
+            # 지터를 섞은 지수 백오프: 연결이 끊긴 직후 첫 재연결은 1초 안에 시도
+            delay = random.uniform(0, min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * (2 ** failures)))
+            failures += 1
+            await asyncio.sleep(delay)
+
+    async def _heartbeat(self, websocket):
+        # recv 타임아웃과 무관하게 일정 주기로 클라이언트 PING(cmd 0)을 보냄
+        try:
+            while True:
+                await asyncio.sleep(CHAT_PING_INTERVAL)
+                await websocket.send(self.codec.dumps({"ver": "2", "cmd": 0}))
+        except Exception as e:
+            # PING을 보낼 수 없으면 recv 타임아웃까지 기다리지 않고 연결을 닫아 바로 재연결하게 함
+            logger.debug("채팅 서버 PING 전송 실패: %s", e)
+            await websocket.close()
+
+    async def _receive_chat(self, websocket):
+        heartbeat = asyncio.create_task(self._heartbeat(websocket))
+        try:
+            while self.is_listening:
+                # PING 응답도 프레임이므로, 이 시간 동안 아무것도 오지 않으면 죽은 연결로 판단
+                message_json = await asyncio.wait_for(websocket.recv(), timeout=CHAT_RECV_TIMEOUT)
+                self._frames_metric.inc()
+                cmd, items = self.codec.decode_frame(message_json)
+                if cmd == 0: await websocket.send(self.codec.dumps({"ver": "2", "cmd": 10000}))  # 서버 PING에 PONG으로 응답
+                elif items:
+                    stats = self.chat_stats
+                    forwarded = throttled = 0
+                    throttle, code_filter, now = self.chat_throttle, self.pending_code_filter, time.monotonic()
+                    for msg, profile, uid in items:
+                        if isinstance(msg, str): msg = msg.strip()
+                        # 프로필 JSON 디코딩이나 콜백 호출 전에 인증 코드가 아닌 채팅을 걸러냄
+                        if not msg or not AUTH_CODE_PATTERN.fullmatch(msg):
+                            continue
+                        # 코드를 연달아 입력하는 사용자는 코드 조회 전에 버림 (무작위 대입 방지)
+                        if throttle is not None and not throttle.allow(uid, now):
+                            throttled += 1
+                            continue
+                        if code_filter and not code_filter(msg):
+                            continue
+                        forwarded += 1
+                        if self.on_auth_message_callback: await self.on_auth_message_callback(self.codec.nickname(profile), msg, self.channel_id, uid)
+                    # 메시지마다가 아니라 프레임마다 한 번씩 집계
+                    stats["seen"] += len(items)
+                    stats["rejected"] += len(items) - forwarded
+                    stats["forwarded"] += forwarded
+                    stats["throttled"] += throttled
+                    self._seen_metric.inc(len(items))
+                    self._rejected_metric.inc(len(items) - forwarded)
+                    self._forwarded_metric.inc(forwarded)
+                    self._throttled_metric.inc(throttled)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
 
     async def send_chat(self, message):
         await self.get_access_token()
         if not self.access_token or not self.chat_channel_id:
-            print("액세스 토큰 또는 채팅 채널 ID가 없어 메시지를 보낼 수 없습니다.")
-            return
+            logger.warning("액세스 토큰 또는 채팅 채널 ID가 없어 메시지를 보낼 수 없습니다.")
+            return None
 
         url = "https://openapi.chzzk.naver.com/open/v1/chats/send"
         headers = {
@@ -210,17 +681,16 @@ class ChzzkAPI:
             "message": message
         }
 
-        response = await asyncio.get_event_loop().run_in_executor(
-            None,
-            lambda: self.session.post(url, headers=headers, json=payload)
-        )
+        response = await self._request("POST", url, headers=headers, json=payload)
 
         if response.status_code == 200:
-            print(f"치지직 채팅 전송 성공: {message}")
+            logger.debug("치지직 채팅 전송 성공: %s", message)
         else:
-            print(f"치지직 채팅 전송 실패: {response.status_code}, {response.text}")
+            logger.warning("치지직 채팅 전송 실패: channel=%s status=%s body=%s", self.channel_id, response.status_code, response.text)
+        return response
 
     async def close(self):
         self.is_listening = False
         if self.websocket and self.websocket.open: await self.websocket.close()
-        self.session.close(); print("ChzzkAPI 세션을 종료했습니다.")
+        if self._owns_auth:
+            await self.auth.close(); logger.info("ChzzkAPI 세션을 종료했습니다.")
@@ -1,8 +1,17 @@
 # discord_bot.py
 import discord
-import random
 import asyncio
+import logging
 import os
+import time
+from verification_store import PendingVerificationStore
+from state_store import StateStore
+from chat_dispatcher import ChatDispatcher
+from role_scheduler import RoleGrantScheduler
+from announcement import AnnouncementManager
+from instrumentation import CODES_MATCHED, VERIFICATIONS, PENDING_VERIFICATIONS
+
+logger = logging.getLogger(__name__)
 
 class VerificationView(discord.ui.View):
     def __init__(self, bot, *args, **kwargs):
@@ -15,21 +24,31 @@ class VerificationView(discord.ui.View):
         user = interaction.user
 
         # 이미 인증된 사용자인지 확인
-        auth_role_id = int(os.getenv("DISCORD_AUTH_ROLE_ID"))
-        auth_role = interaction.guild.get_role(auth_role_id)
+        auth_role = interaction.guild.get_role(self.bot.get_auth_role_id(interaction.guild.id))
         if auth_role and auth_role in user.roles:
             await interaction.response.send_message("이미 인증을 완료하셨습니다.", ephemeral=True)
             return
+        # 역할 캐시와 무관하게 저장된 인증 기록을 확인하고, 역할이 빠져 있으면 다시 부여
+        if await self.bot.state_store.is_verified(interaction.guild.id, user.id):
+            await interaction.response.send_message("이미 인증을 완료하셨습니다.", ephemeral=True)
+            if auth_role:
+                try:
+                    await self.bot.role_scheduler.grant(user, auth_role)
+                except discord.HTTPException as e:
+                    logger.warning("저장된 인증 기록으로 역할을 복구하지 못했습니다: %s", e)
+            return
 
         # 인증 절차 진행 중인지 확인
         if user.id in self.bot.verifying_users:
             await interaction.response.send_message("이미 인증 절차를 진행 중입니다. 전송된 코드를 확인해주세요.", ephemeral=True)
             return
 
-        auth_code = str(random.randint(100000, 999999))
-        self.bot.verifying_users[user.id] = {"code": auth_code}
+        # 3분 후 만료 처리는 DiscordBot._expire_pending_loop가 일괄로 담당하므로 핸들러는 바로 반환
+        pending = self.bot.verifying_users.create(user.id, guild_id=interaction.guild.id, followup=interaction.followup)
+        self.bot.persist_pending(pending)
+        auth_code = pending.code
 
-        print(f"인증 코드 생성: {user.name} ({user.id}) - {auth_code}")
+        logger.info("인증 코드 생성: user=%s user_id=%s code=%s", user.name, user.id, auth_code)
 
         try:
             await interaction.response.send_message(
@@ -45,51 +64,100 @@ class VerificationView(discord.ui.View):
             )
 
 
-        # 3분 후 인증 코드 삭제
-        await asyncio.sleep(180)
-
-        if user.id in self.bot.verifying_users and self.bot.verifying_users[user.id]["code"] == auth_code:
-            del self.bot.verifying_users[user.id]
-            print(f"인증 시간 초과: {user.name} ({user.id})")
-            try:
-                # ephemeral 메시지는 수정/삭제가 제한적이므로, 후속 메시지 전송
-                await interaction.followup.send("인증 시간이 초과되었습니다. '인증하기' 버튼을 다시 눌러주세요.", ephemeral=True)
-            except discord.errors.NotFound:
-                # 사용자가 상호작용을 닫았을 수 있음
-                pass
-
-
 class DiscordBot(discord.Client):
-    def __init__(self, chzzk_api, auth_channel_id, auth_role_id):
+    def __init__(self, chzzk_manager, auth_channel_id, auth_role_id):
         intents = discord.Intents.default()
         intents.members = True
         intents.message_content = True
         super().__init__(intents=intents)
 
-        self.chzzk_api = chzzk_api
+        self.chzzk_manager = chzzk_manager
         self.auth_channel_id = auth_channel_id
         self.auth_role_id = auth_role_id
-        self.verifying_users = {}  # {discord_user_id: {"code": "123456"}}
-        self.announcement_message_id = None
+        self.verifying_users = PendingVerificationStore(ttl=180)  # 코드 <-> 디스코드 유저 ID 양방향 인덱스
+        PENDING_VERIFICATIONS.set_function(lambda: len(self.verifying_users))
+        self.state_store = StateStore(os.getenv("STATE_DB_PATH", "verification_state.db"))
+        self.expiry_task = None
+        self.auth_in_progress = set()  # 워커 여러 개가 같은 사용자를 동시에 처리하지 않도록 함
+        # 같은 치지직 계정으로 두 디스코드 계정이 동시에 인증되지 않도록 함 (uid 확인 ~ 인증 기록 사이를 직렬화)
+        self.uids_in_progress = set()  # {(guild_id, chzzk_uid)}
+        # 켜면 치지직 계정(uid) 하나로 서버당 디스코드 계정 하나만 인증 (닉네임은 바뀌거나 겹칠 수 있음)
+        self.bind_chzzk_uid = os.getenv("CHZZK_BIND_UID", "0") == "1"
+        self.role_scheduler = RoleGrantScheduler(concurrency=int(os.getenv("ROLE_GRANT_CONCURRENCY", "5")))
+        # 치지직 채널별로 인증 완료 채팅을 모아서 속도 제한에 맞춰 전송
+        self.chat_dispatchers = {channel_id: ChatDispatcher(api) for channel_id, api in chzzk_manager.apis.items()}
+        # 인증 공지는 DISCORD_AUTH_CHANNEL_ID 채널과, 라우팅에 인증 채널이 지정된 서버마다 하나씩 관리
+        self.announcements = {}  # {인증 채널 ID: AnnouncementManager}
+        for channel_id in [auth_channel_id, *chzzk_manager.auth_channels.values()]:
+            if channel_id and channel_id not in self.announcements:
+                # 기본 인증 채널은 이전 버전과 같은 상태 파일을 사용
+                path = "announcement_state.json" if channel_id == auth_channel_id else f"announcement_state_{channel_id}.json"
+                self.announcements[channel_id] = AnnouncementManager(
+                    lambda channel_id=channel_id: self.get_channel(channel_id), self.build_announcement, path=path)
         # View를 인스턴스 변수로 저장하고, custom_id를 지정하여 on_ready에서 한 번만 등록
         self.persistent_view = VerificationView(self)
 
+    async def setup_hook(self):
+        await self.state_store.open()
+        # 재시작 전에 발급된 인증 코드 복원 (time.time 기준 만료 시각을 monotonic 기준으로 변환)
+        offset = time.monotonic() - time.time()
+        restored = [self.verifying_users.restore(discord_id, code, guild_id, expires_at + offset)
+                    for code, discord_id, guild_id, expires_at in await self.state_store.load_pending()]
+        if any(restored):
+            logger.info("진행 중이던 인증 %d건을 복원했습니다.", sum(1 for entry in restored if entry))
+        for dispatcher in self.chat_dispatchers.values():
+            dispatcher.start()
+        self.expiry_task = asyncio.create_task(self._expire_pending_loop())
+
+    async def _expire_pending_loop(self):
+        # 버튼 클릭마다 코루틴을 재워두는 대신, 만료 시각 힙을 하나의 태스크가 주기적으로 비움
+        while True:
+            next_expiry = self.verifying_users.next_expiry()
+            delay = 1.0 if next_expiry is None else min(max(next_expiry - time.monotonic(), 0), 1.0)
+            await asyncio.sleep(delay)
+            # 한 번의 처리에서 오류가 나도 만료 작업 자체는 계속 돌아야 함 (멈추면 코드가 영원히 남음)
+            try:
+                expired = self.verifying_users.pop_expired()
+                if not expired:
+                    continue
+                for entry in expired:
+                    self.state_store.remove_pending(entry.code)
+                logger.info("인증 시간 초과: %d건", len(expired))
+                results = await asyncio.gather(*(self._send_timeout_notice(entry) for entry in expired if entry.followup), return_exceptions=True)
+                for error in results:
+                    if isinstance(error, Exception):
+                        logger.warning("인증 시간 초과 안내 전송 중 오류 발생: %r", error)
+            except Exception:
+                logger.exception("인증 만료 처리 중 오류 발생")
+
+    async def _send_timeout_notice(self, entry):
+        try:
+            # ephemeral 메시지는 수정/삭제가 제한적이므로, 후속 메시지 전송
+            await entry.followup.send("인증 시간이 초과되었습니다. '인증하기' 버튼을 다시 눌러주세요.", ephemeral=True)
+        except discord.NotFound:
+            # 사용자가 상호작용을 닫았을 수 있음
+            pass
+        except discord.HTTPException as e:
+            logger.warning("인증 시간 초과 안내 전송 중 오류 발생: %s", e)
+
+    def persist_pending(self, pending):
+        expires_at = time.time() + (pending.expires_at - time.monotonic())
+        self.state_store.add_pending(pending.code, pending.user_id, pending.guild_id, expires_at)
+
+    def get_auth_role_id(self, guild_id):
+        route = self.chzzk_manager.route_for_guild(guild_id)
+        return route.role_id if route else self.auth_role_id
 
     async def on_ready(self):
-        print(f'{self.user} (ID: {self.user.id})가 성공적으로 로그인했습니다.')
-        print('------')
+        logger.info("%s (ID: %s)가 성공적으로 로그인했습니다.", self.user, self.user.id)
 
         # View를 봇에 추가. 봇이 재시작되어도 버튼이 동작하도록 함.
         self.add_view(self.persistent_view)
 
-        await self.send_announcement()
-
-    async def send_announcement(self, offline=False):
-        channel = self.get_channel(self.auth_channel_id)
-        if not channel:
-            print(f"오류: 인증 채널을 찾을 수 없습니다 (ID: {self.auth_channel_id})")
-            return
+        # 게이트웨이 재연결로 on_ready가 반복되거나 온라인/오프라인이 빠르게 바뀌어도 마지막 상태만 반영
+        await asyncio.gather(*(announcement.update() for announcement in self.announcements.values()))
 
+    def build_announcement(self, offline=False):
         embed = discord.Embed(
             title="치지직-디스코드 연동 인증",
             description="치지직 스트리머 채널과 연동하여 인증된 사용자 역할을 받아보세요!",
@@ -104,123 +172,116 @@ class DiscordBot(discord.Client):
             embed.add_field(name="인증 방법", value="1. 아래 '인증하기' 버튼을 클릭하세요.\n2. 봇이 보내주는 6자리 인증 코드를 확인합니다.\n3. **인증하려는 치지직 계정으로** 방송 채팅창에 해당 인증 코드를 입력해주세요.", inline=False)
             embed.set_footer(text="봇이 온라인 상태일 때만 인증이 가능합니다.")
             view = self.persistent_view
+        return embed, view
 
-        message = await self.get_announcement_message(channel)
+    async def send_announcement(self, offline=False):
+        # 내용이 바뀌었을 때만 수정 요청을 보냄 (재연결로 on_ready가 다시 불려도 REST 요청 없음)
+        await asyncio.gather(*(announcement.update(offline, immediate=True) for announcement in self.announcements.values()))
 
-        if message:
-            try:
-                await message.edit(embed=embed, view=view)
-                print("기존 공지 메시지를 수정했습니다.")
-            except Exception as e:
-                print(f"공지 메시지 수정 중 오류 발생: {e}")
-                self.announcement_message_id = None # 메시지 ID가 유효하지 않을 수 있으므로 초기화
-                await self.create_new_announcement(channel, embed, view)
-        else:
-            await self.create_new_announcement(channel, embed, view)
+    async def handle_successful_auth(self, chzzk_nickname, auth_code, chzzk_channel_id=None, chzzk_uid=None):
+        logger.debug("인증 시도 감지: 닉네임 '%s', 코드 '%s'", chzzk_nickname, auth_code)
 
-    async def create_new_announcement(self, channel, embed, view):
-        try:
-            message = await channel.send(embed=embed, view=view)
-            self.announcement_message_id = message.id
-            with open("announcement_message_id.txt", "w") as f:
-                f.write(str(message.id))
-            print("새로운 공지 메시지를 전송하고 ID를 저장했습니다.")
-        except discord.Forbidden:
-            print(f"오류: '{channel.name}' 채널에 메시지를 보낼 권한이 없습니다.")
-        except Exception as e:
-            print(f"새 공지 메시지 생성 중 오류 발생: {e}")
-
-    async def get_announcement_message(self, channel):
-        if not self.announcement_message_id:
-            try:
-                with open("announcement_message_id.txt", "r") as f:
-                    self.announcement_message_id = int(f.read().strip())
-            except FileNotFoundError:
-                return None
+        pending = self.verifying_users.get_by_code(auth_code)
+        if not pending or pending.user_id in self.auth_in_progress:
+            return
+        CODES_MATCHED.inc()
+        # 다른 스트리머 채널의 채팅에 입력된 코드는 해당 서버의 인증으로 인정하지 않음
+        route = self.chzzk_manager.routes.get(chzzk_channel_id)
+        if route and pending.guild_id is not None and pending.guild_id != route.guild_id:
+            VERIFICATIONS.labels("wrong_channel").inc()
+            return
+        target_user_id = pending.user_id
+        uid_key = (pending.guild_id, chzzk_uid) if self.bind_chzzk_uid and chzzk_uid else None
+        if uid_key in self.uids_in_progress:
+            # 먼저 처리 중인 인증이 끝나면 코드가 남아 있으므로 다시 입력하면 uid 확인을 거쳐 처리됨
+            logger.warning("치지직 계정 '%s'의 다른 인증이 진행 중이어서 건너뜁니다. channel=%s code=%s result=uid_busy", chzzk_nickname, chzzk_channel_id, auth_code)
+            VERIFICATIONS.labels("uid_busy").inc()
+            return
 
+        self.auth_in_progress.add(target_user_id)
+        if uid_key:
+            self.uids_in_progress.add(uid_key)
         try:
-            return await channel.fetch_message(self.announcement_message_id)
-        except discord.NotFound:
-            print("저장된 ID의 공지 메시지를 찾을 수 없습니다. 새로 생성합니다.")
-            return None
-        except discord.Forbidden:
-            print("공지 메시지를 가져올 권한이 없습니다.")
-            return None
-
-    async def handle_successful_auth(self, chzzk_nickname, auth_code):
-        print(f"인증 시도 감지: 닉네임 '{chzzk_nickname}', 코드 '{auth_code}'")
-
-        target_user_id = None
-        for user_id, data in self.verifying_users.items():
-            if data["code"] == auth_code:
-                target_user_id = user_id
-                break
+            await self._complete_verification(target_user_id, pending.guild_id, chzzk_nickname, auth_code, chzzk_channel_id, chzzk_uid)
+        finally:
+            self.auth_in_progress.discard(target_user_id)
+            self.uids_in_progress.discard(uid_key)
 
-        if not target_user_id:
-            return
-
-        guild_id = os.getenv("DISCORD_GUILD_ID")
+    async def _complete_verification(self, target_user_id, guild_id, chzzk_nickname, auth_code, chzzk_channel_id, chzzk_uid=None):
+        guild_id = guild_id or os.getenv("DISCORD_GUILD_ID")
         if not guild_id:
-            print("오류: DISCORD_GUILD_ID가 .env 파일에 설정되지 않았습니다.")
+            logger.error("DISCORD_GUILD_ID가 .env 파일에 설정되지 않았습니다.")
             return
 
         guild = self.get_guild(int(guild_id))
         if not guild:
-            print(f"오류: 서버를 찾을 수 없습니다 (ID: {guild_id})")
+            logger.error("서버를 찾을 수 없습니다. guild_id=%s channel=%s code=%s result=no_guild", guild_id, chzzk_channel_id, auth_code)
             return
 
         member = guild.get_member(target_user_id)
-        role = guild.get_role(self.auth_role_id)
+        auth_role_id = self.get_auth_role_id(guild.id)
+        role = guild.get_role(auth_role_id)
 
         if not member or not role:
-            if not member: print(f"오류: 멤버를 찾을 수 없습니다 (ID: {target_user_id})")
-            if not role: print(f"오류: 역할을 찾을 수 없습니다 (ID: {self.auth_role_id})")
+            if not member: logger.error("멤버를 찾을 수 없습니다. user_id=%s channel=%s code=%s result=no_member", target_user_id, chzzk_channel_id, auth_code)
+            if not role: logger.error("역할을 찾을 수 없습니다. role_id=%s channel=%s code=%s result=no_role", auth_role_id, chzzk_channel_id, auth_code)
             return
 
-        # --- 로직 수정 ---
-        # 1. 역할 부여 및 채팅 메시지 전송 (핵심 기능)
-        try:
-            await member.add_roles(role)
-            print(f"'{member.display_name}'님에게 '{role.name}' 역할을 부여했습니다.")
+        if self.bind_chzzk_uid and chzzk_uid:
+            bound = [discord_id for discord_id in await self.state_store.find_by_uid(guild.id, chzzk_uid) if discord_id != member.id]
+            if bound:
+                logger.warning("치지직 계정 '%s'은 이미 다른 디스코드 계정으로 인증되어 있어 거부했습니다. bound_user_id=%s channel=%s code=%s result=uid_bound", chzzk_nickname, bound[0], chzzk_channel_id, auth_code)
+                VERIFICATIONS.labels("uid_bound").inc()
+                return
 
-            await self.chzzk_api.send_chat(f"\"{chzzk_nickname}\"님 디스코드 연동 인증이 완료되었습니다!")
+        # 1. 역할 부여 후 닉네임 변경 (닉네임 변경은 실패해도 인증에 영향 X)
+        base_nickname = f"{chzzk_nickname}({member.display_name})"
+        new_nickname = (base_nickname[:31] + '…') if len(base_nickname) > 32 else base_nickname
+        try:
+            result = await self.role_scheduler.grant(member, role, nick=new_nickname)
         except discord.Forbidden:
-            print(f"오류: '{role.name}' 역할 부여에 실패했습니다. 봇의 권한을 확인해주세요.")
-            # 역할 부여 실패 시, 닉네임 변경 등 후속 조치 없이 종료
+            logger.error("'%s' 역할 부여에 실패했습니다. 봇의 권한을 확인해주세요. channel=%s code=%s result=forbidden", role.name, chzzk_channel_id, auth_code)
+            VERIFICATIONS.labels("forbidden").inc()
+            # 역할 부여 실패 시, 채팅 전송 등 후속 조치 없이 종료
             return
         except Exception as e:
-            print(f"역할 부여 또는 채팅 전송 중 오류 발생: {e}")
+            logger.warning("역할 부여 중 오류 발생: channel=%s code=%s result=error error=%s", chzzk_channel_id, auth_code, e)
+            VERIFICATIONS.labels("error").inc()
             return
 
-        # 2. 닉네임 변경 (부가 기능, 실패해도 전체 인증에 영향 X)
-        try:
-            base_nickname = f"{chzzk_nickname}({member.display_name})"
-            new_nickname = (base_nickname[:31] + '…') if len(base_nickname) > 32 else base_nickname
-            await member.edit(nick=new_nickname)
-            print(f"'{member.display_name}'님의 닉네임을 '{new_nickname}'으로 변경했습니다.")
-        except discord.Forbidden:
-            print(f"경고: '{member.display_name}'님의 닉네임을 변경할 수 없습니다. (봇 권한 부족)")
-        except Exception as e:
-            print(f"닉네임 변경 중 오류 발생: {e}")
+        VERIFICATIONS.labels("granted").inc()
+        logger.info("'%s'님에게 '%s' 역할을 부여했습니다. user_id=%s channel=%s code=%s result=granted", member.display_name, role.name, member.id, chzzk_channel_id, auth_code)
+        if result.nick_changed:
+            logger.info("'%s'님의 닉네임을 '%s'으로 변경했습니다.", member.display_name, new_nickname)
+        else:
+            logger.warning("'%s'님의 닉네임을 변경할 수 없습니다. (봇 권한 부족)", member.display_name)
+
+        # 2. 인증 완료 채팅 전송
+        dispatcher = self.chat_dispatchers.get(chzzk_channel_id)
+        if dispatcher:
+            dispatcher.confirm(chzzk_nickname)
 
         # 3. 인증 과정 완료 처리
-        if target_user_id in self.verifying_users:
-            del self.verifying_users[target_user_id]
-            print(f"사용자 {member.display_name}의 인증 절차를 완료했습니다.")
+        self.state_store.mark_verified(guild.id, member.id, chzzk_nickname, chzzk_channel_id, chzzk_uid)
+        if self.verifying_users.remove_if_code(target_user_id, auth_code):
+            self.state_store.remove_pending(auth_code)
+            logger.info("사용자 %s의 인증 절차를 완료했습니다.", member.display_name)
         # else:
             # print(f"'{auth_code}'에 해당하는 진행 중인 인증을 찾을 수 없습니다.")
 
 
     async def close(self):
-        print("봇 종료 절차를 시작합니다...")
+        logger.info("봇 종료 절차를 시작합니다...")
         try:
-            channel = self.get_channel(self.auth_channel_id)
-            if channel:
-                await self.send_announcement(offline=True)
-            else:
-                print("종료 공지를 보낼 채널을 찾지 못했습니다.")
+            # 채널을 찾지 못한 공지는 AnnouncementManager가 로그를 남기고 건너뜀
+            await self.send_announcement(offline=True)
         except Exception as e:
-            print(f"종료 공지 업데이트 중 오류 발생: {e}")
+            logger.warning("종료 공지 업데이트 중 오류 발생: %s", e)
 
+        await asyncio.gather(*(announcement.close() for announcement in self.announcements.values()))
+        if self.expiry_task:
+            self.expiry_task.cancel()
+        await asyncio.gather(*(dispatcher.close() for dispatcher in self.chat_dispatchers.values()))
         await super().close()
-        print("봇이 성공적으로 종료되었습니다.")
+        await self.state_store.close()
+        logger.info("봇이 성공적으로 종료되었습니다.")
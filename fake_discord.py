@@ -0,0 +1,77 @@
+# fake_discord.py
+"""tests/와 benchmark.py가 함께 쓰는 가짜 디스코드 서버, 역할, 멤버입니다. (REST 지연만 흉내 냄)"""
+import asyncio
+
+
+class FakeRole:
+    def __init__(self, role_id, name="인증됨"):
+        self.id = role_id
+        self.name = name
+
+    def is_default(self):
+        return False
+
+
+class FakeMember:
+    """멤버 REST 요청마다 latency만큼 지연되는 디스코드 멤버. 요청 내역을 calls에 남깁니다."""
+
+    def __init__(self, member_id, latency=0.0):
+        self.id = member_id
+        self.display_name = f"member{member_id}"
+        self.bot = False
+        self.roles = []
+        self.nick = None
+        self.latency = latency
+        self.calls = []
+
+    async def edit(self, roles=None, nick=None, reason=None):
+        self.calls.append(("edit", roles, nick))
+        await asyncio.sleep(self.latency)
+        if roles is not None:
+            self.roles = list(roles)
+        if nick is not None:
+            self.nick = nick
+
+    async def add_roles(self, *roles, reason=None):
+        self.calls.append(("add_roles", roles))
+        await asyncio.sleep(self.latency)
+        self.roles.extend(role for role in roles if role not in self.roles)
+
+    async def remove_roles(self, *roles, reason=None):
+        self.calls.append(("remove_roles", roles))
+        await asyncio.sleep(self.latency)
+        self.roles = [role for role in self.roles if role not in roles]
+
+
+class FakeGuild:
+    """get_member/get_role/fetch_members만 흉내 내는 디스코드 서버. 멤버는 처음 조회할 때 만들어집니다."""
+
+    def __init__(self, guild_id=1, role_id=2, latency=0.0):
+        self.id = guild_id
+        self.role = FakeRole(role_id)
+        self.latency = latency
+        self.members = {}
+        self.fail_after = None
+
+    def new_member(self, member_id):
+        return FakeMember(member_id, self.latency)
+
+    def get_member(self, member_id):
+        member = self.members.get(member_id)
+        if member is None:
+            member = self.members[member_id] = self.new_member(member_id)
+        return member
+
+    def get_role(self, role_id):
+        return self.role if role_id == self.role.id else None
+
+    async def fetch_members(self, limit=None, after=None):
+        """멤버를 ID 순으로 돌려줍니다. fail_after명을 넘기면 연결이 끊긴 것처럼 예외를 냅니다."""
+        after_id = after.id if after else 0
+        for count, member_id in enumerate(sorted(member_id for member_id in self.members if member_id > after_id)):
+            if self.fail_after is not None and count >= self.fail_after:
+                self.fail_after = None
+                raise ConnectionError("가짜 디스코드 연결 끊김")
+            if count % 1000 == 0:
+                await asyncio.sleep(0)  # 페이지 하나를 받아 오는 시점
+            yield self.members[member_id]
@@ -0,0 +1,269 @@
+# instrumentation.py
+"""카운터/게이지/히스토그램, Prometheus 형식 /metrics 엔드포인트, 레벨·빈도 제한 로깅 설정."""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+
+    def labels(self, *labelvalues):
+        """라벨 값이 고정된 하위 지표를 반환합니다. 핫 패스에서는 미리 받아 두고 재사용하세요."""
+        key = tuple(str(value) for value in labelvalues)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, child in list(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, labelvalues))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self, name, labelnames, labelvalues):
+        return [f"{name}{_format_labels(labelnames, labelvalues)} {self.value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _new_child = _CounterChild
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value", "function")
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """수집 시점에 function()의 값을 읽습니다. (큐 길이처럼 이미 다른 곳에 있는 값)"""
+        self.function = function
+
+    def render(self, name, labelnames, labelvalues):
+        value = self.function() if self.function else self.value
+        return [f"{name}{_format_labels(labelnames, labelvalues)} {value}"]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    _new_child = _GaugeChild
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def render(self, name, labelnames, labelvalues):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, labelvalues, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labelnames, labelvalues, [('le', '+Inf')])} {self.count}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, labelvalues)} {self.sum}")
+        lines.append(f"{name}_count{_format_labels(labelnames, labelvalues)} {self.count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+
+def current_rss():
+    """현재 프로세스의 RSS(바이트)입니다. /proc이 없으면 최대 RSS로 대신하고, 둘 다 없으면 0입니다."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CHAT_FRAMES = REGISTRY.register(Counter("chzzk_chat_frames_total", "수신한 치지직 채팅 웹소켓 프레임 수", ["channel"]))
+CHAT_MESSAGES = REGISTRY.register(Counter("chzzk_chat_messages_total", "사전 필터를 거친 채팅 메시지 수", ["channel", "result"]))
+CHAT_RECONNECTS = REGISTRY.register(Counter("chzzk_chat_reconnects_total", "채팅 웹소켓 재연결 횟수", ["channel", "reason"]))
+TOKEN_REFRESHES = REGISTRY.register(Counter("chzzk_token_refreshes_total", "치지직 토큰 발급/재발급 시도 수", ["kind", "result"]))
+CHAT_SENDS = REGISTRY.register(Counter("chzzk_chat_sends_total", "치지직 채팅 전송 결과", ["result"]))
+CHAT_SEND_LATENCY = REGISTRY.register(Histogram("chzzk_chat_send_delay_seconds", "인증 완료 안내가 큐에 들어간 뒤 전송되기까지 걸린 시간", buckets=(0.5, 1, 2, 5, 10, 30, 60)))
+CODES_MATCHED = REGISTRY.register(Counter("auth_codes_matched_total", "진행 중인 인증 코드와 일치한 채팅 수"))
+VERIFICATIONS = REGISTRY.register(Counter("auth_verifications_total", "인증 처리 결과", ["result"]))
+PENDING_VERIFICATIONS = REGISTRY.register(Gauge("auth_pending_verifications", "진행 중인 인증 수"))
+AUTH_QUEUE_DEPTH = REGISTRY.register(Gauge("auth_queue_depth", "인증 작업 큐에 쌓인 작업 수"))
+AUTH_QUEUE_DROPPED = REGISTRY.register(Counter("auth_queue_dropped_total", "큐가 가득 차 버려진 인증 작업 수"))
+CHAT_DISPATCH_DEPTH = REGISTRY.register(Gauge("chzzk_chat_dispatch_queue_depth", "전송 대기 중인 인증 완료 안내 수", ["channel"]))
+DISCORD_REST_LATENCY = REGISTRY.register(Histogram("discord_rest_latency_seconds", "디스코드 REST 요청 소요 시간", ["operation"]))
+DISCORD_REST_RETRIES = REGISTRY.register(Counter("discord_rest_retries_total", "429/5xx로 재시도한 디스코드 REST 요청 수", ["operation"]))
+SHARED_EVENTS = REGISTRY.register(Counter("shared_events_total", "공유 큐에서 꺼낸 인증 이벤트 처리 결과", ["result"]))
+RECONCILE_MEMBERS = REGISTRY.register(Counter("reconcile_members_total", "역할 재검증 작업에서 처리한 멤버 수", ["guild", "result"]))
+RECONCILE_CHECKPOINT = REGISTRY.register(Gauge("reconcile_checkpoint_member_id", "역할 재검증 작업이 마지막으로 처리한 멤버 ID", ["guild"]))
+PROCESS_RSS = REGISTRY.register(Gauge("process_resident_memory_bytes", "프로세스 RSS (바이트)"))
+PROCESS_RSS.set_function(current_rss)
+EVENT_LOOP_LAG = REGISTRY.register(Histogram("event_loop_lag_seconds", "이벤트 루프 지연 (예정보다 늦게 깨어난 시간)", buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)))
+
+
+async def monitor_event_loop_lag(interval=0.5):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - started - interval))
+
+
+async def start_metrics_server(host="127.0.0.1", port=9108, registry=REGISTRY):
+    """GET /metrics 로 Prometheus 텍스트 형식을 제공하는 로컬 HTTP 서버를 시작합니다.
+
+    aiohttp.web을 불러오지 않도록 asyncio 스트림으로 요청 한 줄만 읽고 응답한 뒤 연결을 닫습니다.
+    """
+
+    async def handle(reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            while await asyncio.wait_for(reader.readline(), 5) not in (b"\r\n", b"\n", b""):
+                pass  # 헤더는 사용하지 않음
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", registry.render().encode()
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nX-Content-Type-Options: nosniff\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logging.getLogger(__name__).info("지표 엔드포인트를 시작했습니다: http://%s:%s/metrics", host, port)
+    return server
+
+
+class RateLimitFilter(logging.Filter):
+    """같은 위치(로거, 줄 번호)에서 나오는 로그를 interval초당 burst개로 제한하고, 생략된 개수를 다음 로그에 덧붙입니다."""
+
+    def __init__(self, burst=10, interval=10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {}  # {(name, lineno): [window_start, emitted, suppressed]}
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR and record.exc_info:
+            return True
+        key = (record.name, record.lineno)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = window[2] if window else 0
+            self._windows[key] = [now, 1, 0]
+            if suppressed:
+                record.msg = f"{record.msg} (직전 {self.interval:.0f}초 동안 같은 로그 {suppressed}건 생략)"
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+def setup_logging(level=None, stream=None):
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(name)s - %(message)s"))
+    handler.addFilter(RateLimitFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    # discord.py 자체 로그는 경고 이상만 출력
+    logging.getLogger("discord").setLevel(logging.WARNING)
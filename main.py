@@ -1,70 +1,162 @@
 # main.py
+import argparse
 import asyncio
 import os
+import socket
 from dotenv import load_dotenv
-from discord_bot import DiscordBot
-from chzzk_api import ChzzkAPI
+from channel_manager import ChzzkChannelManager, ChannelRoute, parse_routes
+from auth_queue import AuthWorkQueue
+from instrumentation import setup_logging, start_metrics_server, monitor_event_loop_lag
+from shared_store import open_shared_store
+from sharding import PendingCodePublisher, SharedCodeFilter, SharedEventConsumer
 import logging
 
-# 로깅 설정
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# 로깅 설정 (LOG_LEVEL 환경 변수로 레벨 지정, 같은 위치의 로그는 빈도 제한)
+setup_logging()
 
-async def main():
+# all: 한 프로세스에서 모두 실행 / ingest: 치지직 채팅 수신만 / discord: 디스코드 봇과 역할 부여만
+ROLES = ("all", "ingest", "discord")
+
+async def start_metrics(host, port):
+    """지표 서버를 시작합니다. 포트를 열 수 없으면 로그만 남기고 지표 없이 계속합니다."""
+    try:
+        return await start_metrics_server(host, port)
+    except OSError as e:
+        logging.error("지표 서버를 시작할 수 없어 지표 없이 계속합니다. host=%s port=%d error=%s", host, port, e)
+        return None
+
+def import_role(role):
+    """역할에 필요한 무거운 모듈만 불러옵니다. (ingest 프로세스는 discord.py를 불러오지 않음)"""
+    if role == "ingest":
+        return None
+    from discord_bot import DiscordBot
+    return DiscordBot
+
+async def main(role="all"):
     load_dotenv()
 
     # 필수 환경 변수 확인
-    required_vars = [
-        "DISCORD_TOKEN", "DISCORD_GUILD_ID", "CHZZK_CHANNEL_ID",
-        "DISCORD_AUTH_CHANNEL_ID", "DISCORD_AUTH_ROLE_ID"
-    ]
+    required_vars = ["DISCORD_GUILD_ID", "CHZZK_CHANNEL_ID", "DISCORD_AUTH_ROLE_ID"]
+    if role != "ingest":
+        required_vars += ["DISCORD_TOKEN", "DISCORD_AUTH_CHANNEL_ID"]
+    if role != "all":
+        required_vars.append("SHARED_STORE_URL")
     if not all(os.getenv(var) for var in required_vars):
         logging.error("필수 환경변수가 .env 파일에 설정되지 않았습니다. 프로그램을 종료합니다.")
-        logging.error(f"누락된 변수: {[var for var in required_vars if not os.getenv(var)]}")
+        logging.error("누락된 변수: %s", [var for var in required_vars if not os.getenv(var)])
         return
 
     # 선택적 환경 변수 (쿠키)
     nid_aut = os.getenv("NID_AUT")
     nid_ses = os.getenv("NID_SES")
 
-    chzzk_api = None
+    chzzk_manager = None
     bot = None
+    auth_queue = None
+    shared_store = None
+    background = []  # 종료 시 close()할 공유 저장소 작업들
+    metrics_server = None
+    lag_task = None
 
     try:
-        # 치지직 API 초기화
-        chzzk_api = ChzzkAPI(
-            channel_id=os.getenv("CHZZK_CHANNEL_ID"),
-            nid_aut=nid_aut,
-            nid_ses=nid_ses
-        )
-        await chzzk_api.initialize()
+        # 치지직 채널 라우팅 (CHZZK_CHANNEL_ROUTES가 없으면 단일 채널 설정 사용)
+        routes_spec = os.getenv("CHZZK_CHANNEL_ROUTES")
+        if routes_spec:
+            routes = parse_routes(routes_spec)
+        else:
+            routes = [ChannelRoute(os.getenv("CHZZK_CHANNEL_ID"), os.getenv("DISCORD_GUILD_ID"), os.getenv("DISCORD_AUTH_ROLE_ID"))]
+
+        # 프로세스를 나눠 실행하면 인증 대기 코드와 인증 이벤트를 공유 저장소로 주고받음
+        if role != "all":
+            shared_store = open_shared_store(os.getenv("SHARED_STORE_URL"))
+
+        # 치지직 API 초기화 (모든 채널이 토큰과 HTTP 커넥션 풀을 공유)
+        chzzk_manager = ChzzkChannelManager(routes, nid_aut=nid_aut, nid_ses=nid_ses)
+        owner = f"{role}:{socket.gethostname()}:{os.getpid()}"
+        if shared_store:
+            # Refresh Token은 쓰면 바뀌므로, 재발급은 임대를 얻은 프로세스 하나만 하고 나머지는 공유 저장소에서 받아 씀
+            chzzk_manager.auth.set_shared_store(shared_store, owner=owner)
+        await chzzk_manager.initialize()
 
         # 디스코드 봇 초기화
-        bot = DiscordBot(
-            chzzk_api=chzzk_api,
-            auth_channel_id=int(os.getenv("DISCORD_AUTH_CHANNEL_ID")),
-            auth_role_id=int(os.getenv("DISCORD_AUTH_ROLE_ID"))
-        )
+        DiscordBot = import_role(role)
+        if DiscordBot:
+            bot = DiscordBot(
+                chzzk_manager=chzzk_manager,
+                auth_channel_id=int(os.getenv("DISCORD_AUTH_CHANNEL_ID")),
+                auth_role_id=int(os.getenv("DISCORD_AUTH_ROLE_ID"))
+            )
+
+        worker_count = int(os.getenv("AUTH_WORKER_COUNT", "4"))
+        if role == "discord":
+            # 발급한 코드를 공유하고, 채팅 수신 프로세스가 보낸 인증 이벤트를 처리
+            # (같은 봇 토큰으로 여러 개를 실행하면 버튼 응답이 겹치므로 discord 프로세스는 하나만 실행)
+            logging.info("discord 프로세스는 하나만 실행할 수 있습니다. 채팅 수신(ingest) 프로세스는 여러 개 실행할 수 있습니다. owner=%s", owner)
+            publisher = PendingCodePublisher(shared_store, bot.verifying_users, owner=owner)
+            publisher.start()
+            consumer = SharedEventConsumer(shared_store, bot.handle_successful_auth, bot.verifying_users.has_code,
+                                           worker_count=worker_count, owner=owner)
+            await consumer.start()
+            background += [publisher, consumer]
+        else:
+            # 콜백 함수 설정 (채팅 수신 루프가 디스코드 REST 지연이나 공유 저장소 왕복에 막히지 않도록 큐를 거쳐 처리)
+            if role == "ingest":
+                code_filter = SharedCodeFilter(shared_store)
+                code_filter.start()
+                background.append(code_filter)
+                handler, has_code = shared_store.push_event, code_filter.has_code
+            else:
+                handler, has_code = bot.handle_successful_auth, bot.verifying_users.has_code
+            auth_queue = AuthWorkQueue(
+                handler,
+                max_size=int(os.getenv("AUTH_QUEUE_SIZE", "1000")),
+                worker_count=worker_count
+            )
+            auth_queue.start()
+            chzzk_manager.set_on_auth_message_callback(auth_queue.submit)
+            chzzk_manager.set_pending_code_filter(has_code)
 
-        # 콜백 함수 설정
-        chzzk_api.set_on_auth_message_callback(bot.handle_successful_auth)
+        # 지표 엔드포인트 (METRICS_PORT가 0이면 비활성화)
+        metrics_port = int(os.getenv("METRICS_PORT", "9108"))
+        if metrics_port:
+            metrics_server = await start_metrics(os.getenv("METRICS_HOST", "127.0.0.1"), metrics_port)
+        lag_task = asyncio.create_task(monitor_event_loop_lag())
 
-        # 봇과 API 리스너 동시 실행
-        discord_task = asyncio.create_task(bot.start(os.getenv("DISCORD_TOKEN")))
-        chzzk_task = asyncio.create_task(chzzk_api.listen_chat())
+        # 역할에 따라 봇과 API 리스너 동시 실행
+        tasks = []
+        if bot:
+            tasks.append(asyncio.create_task(bot.start(os.getenv("DISCORD_TOKEN"))))
+        if role != "discord":
+            tasks.append(asyncio.create_task(chzzk_manager.listen_chat()))
 
-        await asyncio.gather(discord_task, chzzk_task)
+        await asyncio.gather(*tasks)
 
     except Exception as e:
-        logging.error(f"메인 루프에서 처리되지 않은 예외 발생: {e}", exc_info=True)
+        logging.error("메인 루프에서 처리되지 않은 예외 발생: %s", e, exc_info=True)
     finally:
         logging.info("프로그램을 종료합니다.")
+        if lag_task:
+            lag_task.cancel()
+        if metrics_server:
+            metrics_server.close()
+            await metrics_server.wait_closed()
+        if auth_queue:
+            await auth_queue.close()
+        for worker in background:
+            await worker.close()
         if bot and not bot.is_closed():
             await bot.close()
-        if chzzk_api:
-            await chzzk_api.close()
+        if chzzk_manager:
+            await chzzk_manager.close()
+        if shared_store:
+            await shared_store.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="치지직-디스코드 인증 봇")
+    parser.add_argument("role", nargs="?", choices=ROLES, default="all",
+                        help="all: 한 프로세스에서 모두 실행, ingest: 치지직 채팅 수신만, discord: 디스코드 봇과 역할 부여만 (SHARED_STORE_URL 필요)")
+    args = parser.parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.role))
     except KeyboardInterrupt:
         logging.info("사용자에 의해 프로그램이 중단되었습니다.")
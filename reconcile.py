@@ -0,0 +1,160 @@
+# reconcile.py
+"""저장된 인증 기록과 서버 멤버의 인증 역할을 일괄 대조하여 맞추는 작업.
+
+서버 멤버를 chunk_size명씩 REST로 받아 오며, 인증 기록이 있는데 역할이 없으면 부여하고
+(--revoke를 주면) 역할이 있는데 인증 기록이 없으면 회수합니다. 기본은 변경 없이 결과만 출력하며,
+--apply로 실제 반영할 때는 묶음마다 체크포인트를 남겨 중단되어도 이어서 진행합니다.
+
+    python reconcile.py                   # 변경 없이 대조 결과만 확인
+    python reconcile.py --apply           # 누락된 역할 부여
+    python reconcile.py --apply --revoke  # 인증 기록이 없는 멤버의 역할 회수까지
+"""
+import argparse
+import asyncio
+import logging
+import os
+import discord
+from dotenv import load_dotenv
+from channel_manager import ChannelRoute, parse_routes
+from instrumentation import RECONCILE_CHECKPOINT, RECONCILE_MEMBERS, setup_logging
+from role_scheduler import RoleGrantScheduler
+from state_store import StateStore
+
+logger = logging.getLogger(__name__)
+
+
+class RoleReconciler:
+    """서버 멤버의 인증 역할을 StateStore의 인증 기록에 맞춥니다.
+
+    역할 변경은 RoleGrantScheduler를 거치므로 동시성 제한과 429 재시도가 그대로 적용됩니다.
+    """
+
+    def __init__(self, state_store, role_scheduler, chunk_size=1000, revoke=False, dry_run=True):
+        self.state_store = state_store
+        self.role_scheduler = role_scheduler
+        self.chunk_size = chunk_size
+        self.revoke = revoke
+        self.dry_run = dry_run
+
+    async def _chunks(self, guild, after_id):
+        # fetch_members는 멤버 ID 순으로 1000명씩 페이지를 받아 옴
+        kwargs = {"after": discord.Object(id=after_id)} if after_id else {}
+        chunk = []
+        async for member in guild.fetch_members(limit=None, **kwargs):
+            chunk.append(member)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def run(self, guild, role, resume=True):
+        """대조 결과 {"scanned", "granted", "revoked", "unrecorded", "failed"}를 돌려줍니다. (dry_run이면 반영할 건수)"""
+        verified = await self.state_store.verified_ids(guild.id)
+        checkpoint = await self.state_store.load_checkpoint(guild.id) if resume and not self.dry_run else None
+        after_id, scanned, granted, revoked = checkpoint or (0, 0, 0, 0)
+        stats = {"scanned": scanned, "granted": granted, "revoked": revoked, "unrecorded": 0, "failed": 0}
+        if checkpoint:
+            logger.info("서버 %s의 역할 재검증을 멤버 ID %s 이후부터 이어서 진행합니다.", guild.id, after_id)
+        metrics = {result: RECONCILE_MEMBERS.labels(guild.id, result) for result in stats}
+        progress = RECONCILE_CHECKPOINT.labels(guild.id)
+
+        async for chunk in self._chunks(guild, after_id):
+            changes = await self._reconcile_chunk(chunk, role, verified)
+            changes["scanned"] = len(chunk)
+            for result, count in changes.items():
+                stats[result] += count
+                metrics[result].inc(count)
+            after_id = chunk[-1].id
+            progress.set(after_id)
+            if not self.dry_run:
+                # 이 묶음까지 반영되었음을 커밋한 뒤 다음 묶음으로 진행
+                self.state_store.save_checkpoint(guild.id, after_id, stats["scanned"], stats["granted"], stats["revoked"])
+                await self.state_store.flush()
+            logger.info("역할 재검증 진행: %s", stats)
+
+        if not self.dry_run:
+            self.state_store.clear_checkpoint(guild.id)
+            await self.state_store.flush()
+        return stats
+
+    async def _reconcile_chunk(self, chunk, role, verified):
+        to_grant, to_revoke, unrecorded = [], [], 0
+        for member in chunk:
+            if member.bot:
+                continue
+            has_role = any(r.id == role.id for r in member.roles)
+            if member.id in verified:
+                if not has_role:
+                    to_grant.append(member)
+            elif has_role:
+                if self.revoke:
+                    to_revoke.append(member)
+                else:
+                    unrecorded += 1
+        changes = {"granted": len(to_grant), "revoked": len(to_revoke), "unrecorded": unrecorded, "failed": 0}
+        if self.dry_run:
+            return changes
+
+        results = await asyncio.gather(
+            *(self.role_scheduler.grant(member, role, reason="인증 기록과 역할 재검증") for member in to_grant),
+            *(self.role_scheduler.revoke(member, role, reason="인증 기록이 없는 역할 회수") for member in to_revoke),
+            return_exceptions=True
+        )
+        for i, (member, result) in enumerate(zip(to_grant + to_revoke, results)):
+            if isinstance(result, Exception):
+                changes["granted" if i < len(to_grant) else "revoked"] -= 1
+                changes["failed"] += 1
+                logger.warning("멤버 %s의 역할을 변경하지 못했습니다: %s", member.id, result)
+        return changes
+
+
+async def run(args):
+    load_dotenv()
+    routes_spec = os.getenv("CHZZK_CHANNEL_ROUTES")
+    if routes_spec:
+        routes = parse_routes(routes_spec)
+    else:
+        routes = [ChannelRoute(os.getenv("CHZZK_CHANNEL_ID"), os.getenv("DISCORD_GUILD_ID"), os.getenv("DISCORD_AUTH_ROLE_ID"))]
+    guild_roles = {}
+    for route in routes:
+        guild_roles.setdefault(route.guild_id, route.role_id)
+
+    intents = discord.Intents.default()
+    intents.members = True
+    client = discord.Client(intents=intents)
+    state_store = StateStore(os.getenv("STATE_DB_PATH", "verification_state.db"))
+    reconciler = RoleReconciler(
+        state_store,
+        RoleGrantScheduler(concurrency=int(os.getenv("ROLE_GRANT_CONCURRENCY", "5"))),
+        chunk_size=args.chunk_size, revoke=args.revoke, dry_run=not args.apply
+    )
+    try:
+        # 게이트웨이에 접속하지 않고 REST만 사용 (실행 중인 봇의 세션과 공지에 영향 없음)
+        await client.login(os.getenv("DISCORD_TOKEN"))
+        await state_store.open()
+        for guild_id, role_id in guild_roles.items():
+            guild = await client.fetch_guild(guild_id)
+            role = guild.get_role(role_id)
+            if not role:
+                logger.error("역할을 찾을 수 없습니다 (서버 ID: %s, 역할 ID: %s)", guild_id, role_id)
+                continue
+            stats = await reconciler.run(guild, role, resume=not args.restart)
+            logger.info("서버 %s의 역할 재검증 %s: %s", guild.name, "완료" if args.apply else "결과 (변경 없음)", stats)
+    finally:
+        await state_store.close()
+        await client.close()
+
+
+def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(description="저장된 인증 기록과 서버 멤버의 인증 역할 일괄 대조")
+    parser.add_argument("--apply", action="store_true", help="대조 결과를 실제로 반영 (없으면 결과만 출력)")
+    parser.add_argument("--revoke", action="store_true", help="인증 기록이 없는 멤버의 인증 역할 회수")
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터 진행")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="한 번에 대조하고 반영할 멤버 수")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
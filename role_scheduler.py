@@ -0,0 +1,66 @@
+# role_scheduler.py
+import asyncio
+import random
+import time
+import discord
+from instrumentation import DISCORD_REST_LATENCY, DISCORD_REST_RETRIES
+
+
+class RoleGrantResult:
+    __slots__ = ("role_granted", "nick_changed")
+
+    def __init__(self, role_granted, nick_changed):
+        self.role_granted = role_granted
+        self.nick_changed = nick_changed
+
+
+class RoleGrantScheduler:
+    """역할 부여와 닉네임 변경을 여러 멤버에 대해 제한된 동시성으로 처리합니다.
+
+    역할은 역할 하나만 추가하는 요청(PUT)으로 부여하므로, 캐시된 역할 목록이 오래되어도 다른 역할을 덮어쓰지 않습니다.
+    429 또는 디스코드 서버 오류는 지터를 섞은 지수 백오프로 재시도합니다.
+    """
+
+    def __init__(self, concurrency=5, max_retries=3, base_delay=0.5):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+
+    async def _call(self, operation, func, *args, **kwargs):
+        histogram = DISCORD_REST_LATENCY.labels(operation)
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                result = await func(*args, **kwargs)
+                histogram.observe(time.monotonic() - started)
+                return result
+            except discord.HTTPException as e:
+                histogram.observe(time.monotonic() - started)
+                if (e.status != 429 and e.status < 500) or attempt == self.max_retries:
+                    raise
+                DISCORD_REST_RETRIES.labels(operation).inc()
+                retry_after = getattr(e, "retry_after", None) or self.base_delay * (2 ** attempt)
+                await asyncio.sleep(retry_after * random.uniform(1.0, 1.5))
+
+    async def grant(self, member, role, nick=None, reason=None):
+        """역할을 부여하고, nick이 있으면 닉네임만 따로 바꿉니다.
+
+        역할 부여에 실패하면 discord.Forbidden 등을 그대로 올려 보내며,
+        닉네임만 바꿀 수 없는 경우(서버 소유자, 상위 역할 등)에는 역할만 부여한 결과를 돌려줍니다.
+        """
+        async with self.semaphore:
+            if not any(r.id == role.id for r in member.roles):
+                await self._call("add_roles", member.add_roles, role, reason=reason)
+            if nick is None:
+                return RoleGrantResult(True, False)
+            try:
+                # 역할 목록을 함께 보내면 캐시에 없는 역할이 지워질 수 있으므로 닉네임만 수정
+                await self._call("member_nick", member.edit, nick=nick, reason=reason)
+                return RoleGrantResult(True, True)
+            except discord.HTTPException:
+                return RoleGrantResult(True, False)
+
+    async def revoke(self, member, role, reason=None):
+        async with self.semaphore:
+            if any(r.id == role.id for r in member.roles):
+                await self._call("remove_roles", member.remove_roles, role, reason=reason)
@@ -0,0 +1,168 @@
+# sharding.py
+"""채팅 수신(ingest)과 디스코드 역할 부여(discord)를 별도 프로세스로 나눠 실행할 때 공유 저장소를 통해 협력하는 작업들입니다."""
+import asyncio
+import logging
+import time
+from instrumentation import SHARED_EVENTS
+from shared_store import decode_event
+
+logger = logging.getLogger(__name__)
+
+
+class PendingCodePublisher:
+    """디스코드 프로세스의 인증 대기 코드를 interval마다 공유 저장소에 반영합니다. (바뀐 코드만 전송)"""
+
+    def __init__(self, store, verifying_users, interval=0.5, owner=None):
+        self.store = store
+        self.verifying_users = verifying_users
+        self.owner = owner  # 코드를 발급한 프로세스 (SharedEventConsumer의 owner와 같은 값)
+        self.interval = interval
+        self.published = set()
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._publish_loop())
+
+    async def publish(self):
+        offset = time.time() - time.monotonic()
+        current = {entry.code: entry.expires_at + offset for entry in self.verifying_users.entries()}
+        added = {code: expires_at for code, expires_at in current.items() if code not in self.published}
+        removed = [code for code in self.published if code not in current]
+        if added or removed:
+            await self.store.sync_pending(added, removed, self.owner)
+        self.published = set(current)
+
+    async def _publish_loop(self):
+        while True:
+            try:
+                await self.publish()
+            except Exception as e:
+                logger.warning("인증 대기 코드 공유 중 오류 발생: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+class SharedCodeFilter:
+    """채팅 수신 프로세스에서 공유 저장소의 인증 대기 코드 목록을 interval마다 받아 두고 동기적으로 조회합니다."""
+
+    def __init__(self, store, interval=0.5):
+        self.store = store
+        self.interval = interval
+        self.codes = frozenset()
+        self.task = None
+
+    def has_code(self, code):
+        return code in self.codes
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._refresh_loop())
+
+    async def refresh(self):
+        self.codes = frozenset(await self.store.pending_codes())
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("인증 대기 코드 목록을 가져오지 못했습니다: %s", e)
+            await asyncio.sleep(self.interval)
+
+    async def close(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+
+class SharedEventConsumer:
+    """공유 큐의 인증 이벤트를 꺼내 handler로 처리합니다.
+
+    같은 코드의 이벤트가 여러 번 들어와도(채팅 수신 프로세스 중복, 재전달) 코드를 먼저 선점한
+    한 번만 처리하고, 인증이 끝난 코드는 done_ttl 동안 선점 상태로 남겨 다시 처리하지 않습니다.
+    처리 후에도 코드가 남아 있으면(역할 부여 실패 등) 선점을 풀어 사용자가 다시 입력할 수 있게 합니다.
+    처리 도중 종료되어 ack하지 못한 이벤트는 다음 start 때 선점을 풀고 다시 처리합니다.
+    다른 프로세스(owner)가 발급한 코드의 이벤트는 버리지 않고 requeue_delay초 뒤 큐에 되돌립니다.
+    """
+
+    def __init__(self, store, handler, code_pending, worker_count=4, lease=60, done_ttl=180, poll_timeout=1.0,
+                 owner=None, requeue_delay=0.5):
+        self.store = store
+        self.handler = handler
+        self.code_pending = code_pending  # 디스코드 프로세스가 발급한 코드인지 확인하는 함수 (code -> bool)
+        self.owner = owner
+        self.requeue_delay = requeue_delay
+        self.worker_count = worker_count
+        self.lease = lease
+        self.done_ttl = done_ttl
+        self.poll_timeout = poll_timeout
+        self.workers = []
+        self.in_flight = 0
+
+    async def start(self):
+        requeued = await self.store.requeue_unacked()
+        if requeued:
+            SHARED_EVENTS.labels("requeued").inc(requeued)
+            logger.info("처리되지 않은 인증 이벤트 %d건을 다시 처리합니다.", requeued)
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    async def _worker(self):
+        while True:
+            try:
+                raw = await self.store.next_event(self.poll_timeout)
+            except Exception as e:
+                logger.warning("공유 큐에서 인증 이벤트를 가져오지 못했습니다: %s", e)
+                await asyncio.sleep(self.poll_timeout)
+                continue
+            if raw is None:
+                continue
+            self.in_flight += 1
+            try:
+                result = await self._process(raw)
+                SHARED_EVENTS.labels(result).inc()
+                if result == "not_owned":
+                    await asyncio.sleep(self.requeue_delay)
+                    await self.store.requeue(raw)
+                else:
+                    await self.store.ack(raw)
+            except Exception as e:
+                # ack하지 않은 이벤트는 다음 시작 때 requeue_unacked로 다시 처리됨
+                SHARED_EVENTS.labels("failed").inc()
+                logger.warning("공유 큐 인증 이벤트 처리 중 오류 발생: %s", e)
+            finally:
+                self.in_flight -= 1
+
+    async def _process(self, raw):
+        chzzk_nickname, auth_code, chzzk_channel_id, chzzk_uid = decode_event(raw)
+        if not self.code_pending(auth_code):
+            owner = await self.store.code_owner(auth_code)
+            return "not_owned" if owner is not None and owner != self.owner else "unknown"
+        if not await self.store.claim(auth_code, self.lease):
+            return "duplicate"
+        try:
+            await self.handler(chzzk_nickname, auth_code, chzzk_channel_id, chzzk_uid)
+        finally:
+            if self.code_pending(auth_code):
+                await self.store.release(auth_code)
+            else:
+                await self.store.complete(auth_code, self.done_ttl)
+        return "processed"
+
+    async def join(self, interval=0.05):
+        """큐가 비고 처리 중인 이벤트가 없을 때까지 기다립니다."""
+        while self.in_flight or await self.store.queued_events():
+            await asyncio.sleep(interval)
+
+    async def close(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
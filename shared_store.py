@@ -0,0 +1,251 @@
+# shared_store.py
+"""채팅 수신 프로세스와 디스코드 역할 부여 프로세스가 함께 쓰는 인증 대기 코드 목록과 인증 이벤트 큐.
+
+SHARED_STORE_URL이 redis:// 이면 Redis(6.2 이상, redis 패키지 필요)를,
+memory:// 이면 같은 프로세스 안에서만 동작하는 대체 구현을 사용합니다.
+이벤트는 처리 중 목록으로 옮겨 두었다가 ack 때 지우므로, 처리 도중 종료되어도 다음 시작 때 다시 처리됩니다.
+(다시 넣는 이벤트의 코드 선점은 풀고, 인증이 끝난 코드의 완료 기록은 남겨 둠)
+역할 부여(discord) 프로세스는 하나만 실행하는 것을 전제로 하며, 코드마다 발급한 프로세스를 함께 기록합니다.
+치지직 토큰도 여기에 보관하고, 재발급은 임대(lease)를 얻은 프로세스 하나만 합니다. (Refresh Token은 한 번 쓰면 바뀜)
+"""
+import asyncio
+import collections
+import json
+import time
+
+
+RELEASE_LEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+CLEAR_CLAIM_SCRIPT = "if redis.call('get', KEYS[1]) == 'lease' then return redis.call('del', KEYS[1]) end return 0"
+
+
+def encode_event(chzzk_nickname, auth_code, chzzk_channel_id, chzzk_uid):
+    return json.dumps([chzzk_nickname, auth_code, chzzk_channel_id, chzzk_uid], ensure_ascii=False)
+
+
+def decode_event(raw):
+    event = json.loads(raw)
+    return event + [None] * (4 - len(event))  # uid가 없던 이전 형식의 이벤트도 처리
+
+
+class MemorySharedStore:
+    """RedisSharedStore와 같은 동작을 하는 프로세스 내부 구현입니다. (단일 프로세스 실행, 부하 측정용)"""
+
+    def __init__(self):
+        self._pending = {}  # {code: expires_at (time.time 기준)}
+        self._owners = {}  # {code: 코드를 발급한 프로세스}
+        self._events = collections.deque()
+        self._processing = []
+        self._event_ready = asyncio.Event()
+        self._claims = {}  # {code: ("lease" 또는 "done", 만료 시각)}
+        self._leases = {}  # {name: (owner, 만료 시각)}
+        self._token = None
+
+    async def sync_pending(self, added, removed, owner=None):
+        """added({code: expires_at})를 owner가 발급한 코드로 추가하고 removed 코드를 지웁니다. 새로 발급된 코드의 이전 선점 기록은 지웁니다."""
+        now = time.time()
+        for code in removed:
+            self._pending.pop(code, None)
+            self._owners.pop(code, None)
+        for code, expires_at in added.items():
+            self._pending[code] = expires_at
+            self._claims.pop(code, None)
+            if owner is not None:
+                self._owners[code] = owner
+        for code in [code for code, expires_at in self._pending.items() if expires_at <= now]:
+            del self._pending[code]
+            self._owners.pop(code, None)
+
+    async def pending_codes(self):
+        now = time.time()
+        return {code for code, expires_at in self._pending.items() if expires_at > now}
+
+    async def code_owner(self, code):
+        """아직 유효한 코드를 발급한 프로세스를 돌려줍니다. (없거나 만료되었으면 None)"""
+        if self._pending.get(code, 0) <= time.time():
+            return None
+        return self._owners.get(code)
+
+    async def push_event(self, chzzk_nickname, auth_code, chzzk_channel_id=None, chzzk_uid=None):
+        self._events.appendleft(encode_event(chzzk_nickname, auth_code, chzzk_channel_id, chzzk_uid))
+        self._event_ready.set()
+
+    async def next_event(self, timeout=1.0):
+        if not self._events:
+            self._event_ready.clear()
+            try:
+                await asyncio.wait_for(self._event_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            if not self._events:
+                return None
+        raw = self._events.pop()
+        self._processing.insert(0, raw)
+        return raw
+
+    async def ack(self, raw):
+        if raw in self._processing:
+            self._processing.remove(raw)
+
+    async def requeue(self, raw):
+        """처리 중인 이벤트를 큐의 맨 뒤로 되돌립니다."""
+        await self.ack(raw)
+        self._events.appendleft(raw)
+        self._event_ready.set()
+
+    async def requeue_unacked(self):
+        count = len(self._processing)
+        while self._processing:
+            raw = self._processing.pop()
+            self._events.append(raw)
+            code = decode_event(raw)[1]
+            if self._claims.get(code, ("done", 0))[0] == "lease":
+                # 처리하던 프로세스가 종료되었으므로 선점을 풀어 다시 처리할 수 있게 함
+                del self._claims[code]
+        if count:
+            self._event_ready.set()
+        return count
+
+    async def queued_events(self):
+        return len(self._events) + len(self._processing)
+
+    async def claim(self, code, lease):
+        now = time.monotonic()
+        if self._claims.get(code, (None, 0))[1] > now:
+            return False
+        self._claims[code] = ("lease", now + lease)
+        return True
+
+    async def complete(self, code, ttl):
+        self._claims[code] = ("done", time.monotonic() + ttl)
+
+    async def release(self, code):
+        self._claims.pop(code, None)
+
+    async def acquire_lease(self, name, owner, ttl):
+        now = time.monotonic()
+        holder, expires_at = self._leases.get(name, (None, 0))
+        if holder not in (None, owner) and expires_at > now:
+            return False
+        self._leases[name] = (owner, now + ttl)
+        return True
+
+    async def release_lease(self, name, owner):
+        if self._leases.get(name, (None, 0))[0] == owner:
+            del self._leases[name]
+
+    async def load_token(self):
+        return self._token
+
+    async def save_token(self, raw):
+        self._token = raw
+
+    async def close(self):
+        pass
+
+
+class RedisSharedStore:
+    """Redis에 인증 대기 코드(정렬 집합), 이벤트 큐(리스트), 코드 선점 기록(만료 키)을 보관합니다."""
+
+    def __init__(self, url, prefix="chzzk-verify:"):
+        import redis.asyncio as redis
+
+        self.redis = redis.from_url(url, decode_responses=True)
+        self.pending_key = f"{prefix}pending"
+        self.owners_key = f"{prefix}pending:owner"
+        self.events_key = f"{prefix}events"
+        self.processing_key = f"{prefix}events:processing"
+        self.claim_prefix = f"{prefix}claim:"
+        self.lease_prefix = f"{prefix}lease:"
+        self.token_key = f"{prefix}token"
+
+    async def sync_pending(self, added, removed, owner=None):
+        pipe = self.redis.pipeline(transaction=False)
+        if removed:
+            pipe.zrem(self.pending_key, *removed)
+            pipe.hdel(self.owners_key, *removed)
+        if added:
+            pipe.zadd(self.pending_key, added)
+            pipe.delete(*(self.claim_prefix + code for code in added))
+            if owner is not None:
+                pipe.hset(self.owners_key, mapping={code: owner for code in added})
+        pipe.zremrangebyscore(self.pending_key, "-inf", time.time())
+        await pipe.execute()
+
+    async def pending_codes(self):
+        return set(await self.redis.zrangebyscore(self.pending_key, time.time(), "+inf"))
+
+    async def code_owner(self, code):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zscore(self.pending_key, code)
+        pipe.hget(self.owners_key, code)
+        expires_at, owner = await pipe.execute()
+        if expires_at is None or expires_at <= time.time():
+            return None
+        return owner
+
+    async def push_event(self, chzzk_nickname, auth_code, chzzk_channel_id=None, chzzk_uid=None):
+        await self.redis.lpush(self.events_key, encode_event(chzzk_nickname, auth_code, chzzk_channel_id, chzzk_uid))
+
+    async def next_event(self, timeout=1.0):
+        return await self.redis.blmove(self.events_key, self.processing_key, timeout, "RIGHT", "LEFT")
+
+    async def ack(self, raw):
+        await self.redis.lrem(self.processing_key, 1, raw)
+
+    async def requeue(self, raw):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lrem(self.processing_key, 1, raw)
+        pipe.lpush(self.events_key, raw)
+        await pipe.execute()
+
+    async def requeue_unacked(self):
+        count = 0
+        while (raw := await self.redis.lmove(self.processing_key, self.events_key, "RIGHT", "RIGHT")) is not None:
+            # 처리하던 프로세스가 종료되었으므로 선점을 풀어 다시 처리할 수 있게 함 (완료 기록은 유지)
+            await self.redis.eval(CLEAR_CLAIM_SCRIPT, 1, self.claim_prefix + decode_event(raw)[1])
+            count += 1
+        return count
+
+    async def queued_events(self):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.llen(self.events_key)
+        pipe.llen(self.processing_key)
+        return sum(await pipe.execute())
+
+    async def claim(self, code, lease):
+        return bool(await self.redis.set(self.claim_prefix + code, "lease", nx=True, ex=max(1, int(lease))))
+
+    async def complete(self, code, ttl):
+        await self.redis.set(self.claim_prefix + code, "done", ex=max(1, int(ttl)))
+
+    async def release(self, code):
+        await self.redis.delete(self.claim_prefix + code)
+
+    async def acquire_lease(self, name, owner, ttl):
+        key = self.lease_prefix + name
+        if await self.redis.set(key, owner, nx=True, ex=max(1, int(ttl))):
+            return True
+        return await self.redis.get(key) == owner
+
+    async def release_lease(self, name, owner):
+        # 임대가 만료되어 다른 프로세스가 가져간 경우에는 지우지 않음
+        await self.redis.eval(RELEASE_LEASE_SCRIPT, 1, self.lease_prefix + name, owner)
+
+    async def load_token(self):
+        return await self.redis.get(self.token_key)
+
+    async def save_token(self, raw):
+        await self.redis.set(self.token_key, raw)
+
+    async def close(self):
+        await self.redis.aclose()
+
+
+def open_shared_store(url):
+    """SHARED_STORE_URL 값으로 공유 저장소를 만듭니다. (redis://, rediss://, unix://, memory://)"""
+    url = url or "memory://"
+    if url.startswith("memory://"):
+        return MemorySharedStore()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSharedStore(url)
+    raise ValueError(f"지원하지 않는 공유 저장소 주소입니다: '{url}' (redis:// 또는 memory://)")
@@ -0,0 +1,214 @@
+# startup_profile.py
+"""봇 시작 시 불러오는 모듈별 import 시간과 RSS 증가량을 측정합니다.
+
+    python startup_profile.py              # all 역할 (디스코드 + 치지직)
+    python startup_profile.py ingest       # 채팅 수신 프로세스
+    python startup_profile.py --preload selenium.webdriver,bs4   # 무거운 모듈을 미리 불러왔을 때와 비교
+
+시간과 RSS는 최상위 패키지 단위로 묶으며, 다른 패키지를 불러오는 데 쓴 몫은 그 패키지로 따로 계산합니다.
+--first-frame을 주면 지정한 채팅 서버에서 첫 채팅 프레임을 받을 때까지 진행한 뒤 결과를 JSON 한 줄로 출력합니다. (benchmark.py --startup에서 사용)
+--full-auth를 주면 지정한 가짜 치지직 서버로 전체 인증(account-interlock -> RedirectCatcher -> 토큰 발급)을 진행한 뒤 결과를 JSON 한 줄로 출력합니다. (benchmark.py --auth-cold-start에서 사용)
+"""
+import argparse
+import importlib
+import json
+import sys
+import time
+from instrumentation import current_rss
+
+
+class _Frame:
+    __slots__ = ("root", "started", "rss", "foreign_time", "foreign_rss")
+
+    def __init__(self, root):
+        self.root = root
+        self.started = time.perf_counter()
+        self.rss = current_rss()
+        self.foreign_time = 0.0  # 다른 패키지를 불러오는 데 쓴 시간
+        self.foreign_rss = 0
+
+
+class ImportProfiler:
+    """sys.meta_path 맨 앞에서 모듈 로더를 감싸 exec_module 구간을 잽니다."""
+
+    def __init__(self):
+        self.stack = []
+        self.totals = {}  # {최상위 패키지: [시간(초), RSS 증가(바이트), 모듈 수]}
+
+    def install(self):
+        sys.meta_path.insert(0, _ProfilingFinder(self))
+
+    def uninstall(self):
+        sys.meta_path[:] = [finder for finder in sys.meta_path if not isinstance(finder, _ProfilingFinder)]
+
+    def enter(self, name):
+        self.stack.append(_Frame(name.partition(".")[0]))
+
+    def exit(self):
+        frame = self.stack.pop()
+        elapsed = time.perf_counter() - frame.started
+        rss = current_rss() - frame.rss
+        parent = self.stack[-1] if self.stack else None
+        totals = self.totals.setdefault(frame.root, [0.0, 0, 0])
+        totals[2] += 1
+        if parent is not None and parent.root == frame.root:
+            # 같은 패키지의 하위 모듈은 바깥 모듈 구간에 이미 포함됨
+            parent.foreign_time += frame.foreign_time
+            parent.foreign_rss += frame.foreign_rss
+            return
+        totals[0] += elapsed - frame.foreign_time
+        totals[1] += rss - frame.foreign_rss
+        if parent is not None:
+            parent.foreign_time += elapsed
+            parent.foreign_rss += rss
+
+    def report(self, limit=25):
+        rows = sorted(self.totals.items(), key=lambda item: item[1][0], reverse=True)
+        lines = [f"{'패키지':<24}{'시간(ms)':>10}{'RSS(KiB)':>12}{'모듈 수':>8}"]
+        for root, (elapsed, rss, count) in rows[:limit]:
+            lines.append(f"{root:<24}{elapsed * 1000:>10.1f}{rss / 1024:>12.0f}{count:>8}")
+        total_time = sum(elapsed for elapsed, _, _ in self.totals.values())
+        lines.append(f"합계 {sum(count for _, _, count in self.totals.values())}개 모듈, {total_time * 1000:.1f}ms, 현재 RSS {current_rss() / 1024 / 1024:.1f}MiB")
+        return "\n".join(lines)
+
+
+class _TimingLoader:
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        # get_resource_reader, get_data 등은 원래 로더로 넘김
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler.enter(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.exit()
+
+
+class _ProfilingFinder:
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimingLoader(spec.loader, self.profiler)
+                return spec
+        return None
+
+
+def preload(modules):
+    """비교용으로 지정한 모듈을 먼저 불러옵니다. 설치되지 않은 모듈은 건너뜁니다."""
+    loaded = []
+    for name in filter(None, modules):
+        try:
+            importlib.import_module(name)
+            loaded.append(name)
+        except ImportError:
+            pass
+    return loaded
+
+
+async def wait_first_frame(uri):
+    """가짜 채팅 서버 uri에 연결해 첫 채팅 메시지가 콜백에 도착할 때까지 기다립니다."""
+    import asyncio
+    from datetime import datetime, timedelta
+    from channel_manager import ChannelRoute, ChzzkChannelManager
+
+    manager = ChzzkChannelManager([ChannelRoute("startup-channel", 1, 2)])
+    manager.auth.access_token = "startup-token"
+    manager.auth.token_expiry_time = datetime.now() + timedelta(days=1)
+    api = manager.get_api("startup-channel")
+    api.chat_server_uri = uri
+    api.chat_channel_id = "startup-channel"
+    first_frame = asyncio.get_running_loop().create_future()
+
+    async def on_message(*args):
+        if not first_frame.done():
+            first_frame.set_result(time.perf_counter())
+
+    manager.set_on_auth_message_callback(on_message)
+    listen_task = asyncio.create_task(manager.listen_chat())
+    received_at = await first_frame
+    api.is_listening = False
+    listen_task.cancel()
+    await asyncio.gather(listen_task, return_exceptions=True)
+    await manager.close()
+    return received_at
+
+
+async def run_full_auth(base_url):
+    """base_url의 가짜 account-interlock/토큰 엔드포인트로 브라우저 없는 전체 인증을 진행하고 소요 시간을 돌려줍니다."""
+    import os
+    import socket
+    import tempfile
+    import chzzk_api
+
+    with socket.socket() as probe:  # 비어 있는 포트를 리디렉션 수신에 사용
+        probe.bind(("127.0.0.1", 0))
+        redirect_port = probe.getsockname()[1]
+    chzzk_api.ACCOUNT_INTERLOCK_URL = f"{base_url}/account-interlock"
+    chzzk_api.TOKEN_URL = f"{base_url}/auth/v1/token"
+    chzzk_api.AUTH_REDIRECT_URI = f"http://127.0.0.1:{redirect_port}"
+    chzzk_api.TOKEN_CACHE_FILE = os.path.join(tempfile.mkdtemp(), "token_cache.json")
+    os.environ["CHZZK_AUTH_MODE"] = "http"
+    auth = chzzk_api.ChzzkAuth("startup-nid-aut", "startup-nid-ses")
+    auth.client_id, auth.client_secret = "startup-client", "startup-secret"
+    started = time.perf_counter()
+    await auth._get_token_with_auth_code()
+    elapsed = time.perf_counter() - started
+    await auth.close()
+    return auth.has_valid_token(), elapsed
+
+
+def main():
+    started = time.perf_counter()
+    parser = argparse.ArgumentParser(description="시작 시 모듈별 import 시간과 RSS 측정")
+    parser.add_argument("role", nargs="?", choices=["all", "ingest", "discord"], default="all")
+    parser.add_argument("--preload", default="", help="쉼표로 구분한, 미리 불러올 모듈 (비교용)")
+    parser.add_argument("--first-frame", metavar="URI", help="첫 채팅 프레임 수신까지 측정할 채팅 서버 주소")
+    parser.add_argument("--full-auth", metavar="URL", help="전체 인증 소요 시간을 측정할 가짜 치지직 서버 주소")
+    args = parser.parse_args()
+
+    profiler = ImportProfiler()
+    profiler.install()
+    preloaded = preload(args.preload.split(","))
+    main_module = importlib.import_module("main")
+    main_module.import_role(args.role)
+    profiler.uninstall()
+    imported = time.perf_counter()
+
+    if args.full_auth:
+        import asyncio
+        issued, auth_seconds = asyncio.run(run_full_auth(args.full_auth))
+        print(json.dumps({
+            "issued": issued, "import_seconds": imported - started, "auth_seconds": auth_seconds,
+            "total_seconds": time.perf_counter() - started, "rss": current_rss(),
+            "selenium_loaded": "selenium" in sys.modules, "web_loaded": "aiohttp.web" in sys.modules
+        }), flush=True)
+        return
+    if args.first_frame:
+        import asyncio
+        received_at = asyncio.run(wait_first_frame(args.first_frame))
+        print(json.dumps({
+            "preloaded": preloaded, "import_seconds": imported - started,
+            "first_frame_seconds": received_at - started, "rss": current_rss(),
+            "modules": len(sys.modules)
+        }), flush=True)
+        return
+    print(profiler.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# state_store.py
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    code TEXT PRIMARY KEY,
+    discord_id INTEGER NOT NULL,
+    guild_id INTEGER,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pending_discord_id ON pending(discord_id);
+CREATE TABLE IF NOT EXISTS verified (
+    guild_id INTEGER NOT NULL,
+    discord_id INTEGER NOT NULL,
+    chzzk_nickname TEXT,
+    chzzk_channel_id TEXT,
+    chzzk_uid TEXT,
+    verified_at REAL NOT NULL,
+    PRIMARY KEY (guild_id, discord_id)
+);
+CREATE INDEX IF NOT EXISTS idx_verified_discord_id ON verified(discord_id);
+CREATE INDEX IF NOT EXISTS idx_verified_chzzk_nickname ON verified(chzzk_nickname);
+CREATE INDEX IF NOT EXISTS idx_verified_chzzk_uid ON verified(guild_id, chzzk_uid);
+CREATE TABLE IF NOT EXISTS reconcile_checkpoint (
+    guild_id INTEGER PRIMARY KEY,
+    after_id INTEGER NOT NULL,
+    scanned INTEGER NOT NULL,
+    granted INTEGER NOT NULL,
+    revoked INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def atomic_write(path, text):
+    """임시 파일에 쓴 뒤 os.replace로 교체하여, 쓰는 도중 종료되어도 파일이 깨지지 않도록 합니다."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class StateStore:
+    """인증 대기 코드와 인증 완료 기록을 SQLite(WAL)에 보관합니다.
+
+    모든 DB 작업은 전용 스레드 하나에서 실행되어 이벤트 루프를 막지 않으며,
+    쓰기 작업은 모아 두었다가 flush_interval마다 한 트랜잭션으로 커밋합니다.
+    """
+
+    def __init__(self, path="verification_state.db", flush_interval=0.2):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="state-store")
+        self.conn = None
+        self._writes = []  # [(sql, params)]
+        self._flush_task = None
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def _open(self):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # chzzk_uid 열이 없던 이전 DB는 인덱스를 만들기 전에 열을 추가
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(verified)")}
+        if columns and "chzzk_uid" not in columns:
+            self.conn.execute("ALTER TABLE verified ADD COLUMN chzzk_uid TEXT")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    async def open(self):
+        if self.conn is None:
+            await self._run(self._open)
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def _commit(self, writes):
+        with self.conn:
+            for sql, params in writes:
+                self.conn.execute(sql, params)
+
+    async def flush(self):
+        if not self._writes or self.conn is None:
+            return
+        writes, self._writes = self._writes, []
+        await self._run(self._commit, writes)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except sqlite3.Error as e:
+                logger.warning("상태 저장소 커밋 중 오류 발생: %s", e)
+
+    # --- 쓰기 (다음 flush 때 한 번에 커밋) ---
+    def add_pending(self, code, discord_id, guild_id, expires_at):
+        """expires_at은 재시작 후에도 비교할 수 있도록 time.time() 기준 시각입니다."""
+        self._writes.append(("INSERT OR REPLACE INTO pending (code, discord_id, guild_id, expires_at) VALUES (?, ?, ?, ?)", (code, discord_id, guild_id, expires_at)))
+
+    def remove_pending(self, code):
+        self._writes.append(("DELETE FROM pending WHERE code = ?", (code,)))
+
+    def mark_verified(self, guild_id, discord_id, chzzk_nickname, chzzk_channel_id=None, chzzk_uid=None):
+        self._writes.append((
+            "INSERT OR REPLACE INTO verified (guild_id, discord_id, chzzk_nickname, chzzk_channel_id, chzzk_uid, verified_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (guild_id, discord_id, chzzk_nickname, chzzk_channel_id, chzzk_uid, time.time())
+        ))
+
+    def save_checkpoint(self, guild_id, after_id, scanned, granted, revoked):
+        """역할 재검증 작업이 after_id까지의 멤버를 처리했음을 기록합니다."""
+        self._writes.append((
+            "INSERT OR REPLACE INTO reconcile_checkpoint (guild_id, after_id, scanned, granted, revoked, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (guild_id, after_id, scanned, granted, revoked, time.time())
+        ))
+
+    def clear_checkpoint(self, guild_id):
+        self._writes.append(("DELETE FROM reconcile_checkpoint WHERE guild_id = ?", (guild_id,)))
+
+    # --- 읽기 (대기 중인 쓰기를 먼저 반영) ---
+    def _load_pending(self, now):
+        with self.conn:
+            self.conn.execute("DELETE FROM pending WHERE expires_at <= ?", (now,))
+        return self.conn.execute("SELECT code, discord_id, guild_id, expires_at FROM pending").fetchall()
+
+    async def load_pending(self):
+        await self.flush()
+        return await self._run(self._load_pending, time.time())
+
+    def _is_verified(self, guild_id, discord_id):
+        row = self.conn.execute("SELECT 1 FROM verified WHERE guild_id = ? AND discord_id = ?", (guild_id, discord_id)).fetchone()
+        return row is not None
+
+    async def is_verified(self, guild_id, discord_id):
+        await self.flush()
+        return await self._run(self._is_verified, guild_id, discord_id)
+
+    def _find_by_nickname(self, chzzk_nickname):
+        return self.conn.execute("SELECT guild_id, discord_id FROM verified WHERE chzzk_nickname = ?", (chzzk_nickname,)).fetchall()
+
+    async def find_by_nickname(self, chzzk_nickname):
+        await self.flush()
+        return await self._run(self._find_by_nickname, chzzk_nickname)
+
+    def _find_by_uid(self, guild_id, chzzk_uid):
+        return [row[0] for row in self.conn.execute("SELECT discord_id FROM verified WHERE guild_id = ? AND chzzk_uid = ?", (guild_id, chzzk_uid))]
+
+    async def find_by_uid(self, guild_id, chzzk_uid):
+        """해당 치지직 계정(uid)으로 인증된 디스코드 유저 ID 목록을 돌려줍니다."""
+        await self.flush()
+        return await self._run(self._find_by_uid, guild_id, chzzk_uid)
+
+    def _verified_ids(self, guild_id):
+        return {row[0] for row in self.conn.execute("SELECT discord_id FROM verified WHERE guild_id = ?", (guild_id,))}
+
+    async def verified_ids(self, guild_id):
+        await self.flush()
+        return await self._run(self._verified_ids, guild_id)
+
+    def _load_checkpoint(self, guild_id):
+        return self.conn.execute("SELECT after_id, scanned, granted, revoked FROM reconcile_checkpoint WHERE guild_id = ?", (guild_id,)).fetchone()
+
+    async def load_checkpoint(self, guild_id):
+        """(after_id, scanned, granted, revoked) 또는 None을 돌려줍니다."""
+        await self.flush()
+        return await self._run(self._load_checkpoint, guild_id)
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        if self.conn is not None:
+            await self.flush()
+            await self._run(self.conn.close)
+            self.conn = None
+        self.executor.shutdown(wait=True)
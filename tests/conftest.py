@@ -0,0 +1,107 @@
+# tests/conftest.py
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import discord
+import websockets.exceptions
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("CHZZK_JSON_CODEC", "json")
+
+from discord_bot import DiscordBot
+from fake_discord import FakeGuild, FakeMember, FakeRole  # 테스트 파일은 conftest에서 가져다 씀
+
+
+def chat_frame(items, channel_id="test-channel"):
+    """(uid, msg) 목록을 치지직 채팅 프레임(cmd 93101) 문자열로 만듭니다."""
+    return json.dumps({"svcid": "game", "ver": "1", "cmd": 93101, "cid": channel_id, "bdy": [
+        {"uid": uid, "msg": msg, "msgTypeCode": 1,
+         "profile": json.dumps({"userIdHash": uid, "nickname": f"시청자{uid}"}, ensure_ascii=False)}
+        for uid, msg in items
+    ]}, ensure_ascii=False)
+
+
+class FakeWebSocket:
+    """recv로 frames를 차례로 돌려준 뒤 연결이 끊긴 것처럼 ConnectionClosed를 냅니다."""
+
+    def __init__(self, frames, delay=0.0, fail_send=False):
+        self.frames = list(frames)
+        self.delay = delay
+        self.fail_send = fail_send
+        self.sent = []
+        self.closed = False
+
+    async def recv(self):
+        await asyncio.sleep(self.delay)
+        if self.closed or not self.frames:
+            raise websockets.exceptions.ConnectionClosedError(None, None)
+        return self.frames.pop(0)
+
+    async def send(self, data):
+        if self.fail_send and self.sent:
+            raise websockets.exceptions.ConnectionClosedError(None, None)
+        self.sent.append(data)
+
+    async def close(self):
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeChannelManager:
+    """DiscordBot이 사용하는 ChzzkChannelManager의 속성만 흉내 냅니다."""
+
+    def __init__(self, routes=None, apis=None, auth_channels=None):
+        self.routes = routes or {}
+        self.guild_routes = {}
+        self.apis = apis or {}
+        self.auth_channels = auth_channels or {}
+
+    def route_for_guild(self, guild_id):
+        return self.guild_routes.get(guild_id)
+
+
+def make_bot(monkeypatch, tmp_path, guild, bind_uid=False, manager=None, auth_channel_id=10):
+    """tmp_path에 상태를 저장하고 get_guild가 guild를 돌려주는 DiscordBot을 만듭니다. (이벤트 루프 안에서 호출)"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("STATE_DB_PATH", str(tmp_path / "state.db"))
+    monkeypatch.setenv("CHZZK_BIND_UID", "1" if bind_uid else "0")
+    bot = DiscordBot(manager or FakeChannelManager(), auth_channel_id=auth_channel_id, auth_role_id=guild.role.id)
+    monkeypatch.setattr(bot, "get_guild", lambda guild_id: guild if guild_id == guild.id else None)
+    return bot
+
+
+class FakeMessage:
+    def __init__(self, message_id, deleted=False):
+        self.id = message_id
+        self.deleted = deleted
+        self.edits = 0
+
+    async def edit(self, **kwargs):
+        if self.deleted:
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+        self.edits += 1
+
+
+class FakeTextChannel:
+    """공지 메시지 전송만 흉내 내는 디스코드 채널."""
+
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.name = f"channel{channel_id}"
+        self.messages = []
+
+    async def send(self, **kwargs):
+        self.messages.append(FakeMessage(self.id * 1000 + len(self.messages)))
+        return self.messages[-1]
+
+    def get_partial_message(self, message_id):
+        # 삭제되었거나 다른 채널의 메시지는 수정할 때 NotFound를 냄
+        return next((message for message in self.messages if message.id == message_id), FakeMessage(message_id, deleted=True))
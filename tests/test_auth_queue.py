@@ -0,0 +1,71 @@
+# tests/test_auth_queue.py
+import asyncio
+import time
+
+import pytest
+import websockets.exceptions
+
+from auth_queue import AuthWorkQueue
+from chzzk_api import ChzzkAPI, ChzzkAuth
+from conftest import FakeGuild, FakeWebSocket, chat_frame, make_bot
+from instrumentation import AUTH_QUEUE_DROPPED
+
+
+def test_slow_discord_does_not_block_chat_loop(monkeypatch, tmp_path):
+    # 멤버 REST 요청마다 0.1초가 걸리는 서버에서 코드 40건을 워커 4개로 처리하면 최소 2초(역할 + 닉네임)
+    guild = FakeGuild(latency=0.1)
+
+    async def scenario():
+        bot = make_bot(monkeypatch, tmp_path, guild)
+        await bot.state_store.open()
+        codes = [bot.verifying_users.create(member_id, guild.id).code for member_id in range(1, 41)]
+        queue = AuthWorkQueue(bot.handle_successful_auth, max_size=100, worker_count=4)
+        api = ChzzkAPI("test-channel", auth=ChzzkAuth())
+        api.set_chat_throttle(None)
+        api.set_pending_code_filter(bot.verifying_users.has_code)
+        api.set_on_auth_message_callback(queue.submit)
+        api.is_listening = True
+        frames = [chat_frame([(f"u{i}-{j}", "ㅋㅋㅋ") for j in range(9)] + [(f"u{i}", codes[i // 10] if i % 10 == 0 else "안녕")])
+                  for i in range(400)]
+        queue.start()
+        started = time.perf_counter()
+        with pytest.raises(websockets.exceptions.ConnectionClosed):
+            await api._receive_chat(FakeWebSocket(frames))
+        chat_elapsed = time.perf_counter() - started
+        await asyncio.wait_for(queue.queue.join(), timeout=10)
+        await queue.close()
+        await bot.state_store.close()
+        return api, queue, chat_elapsed
+
+    api, queue, chat_elapsed = asyncio.run(scenario())
+    assert api.chat_stats["seen"] == 4000
+    assert chat_elapsed < 1.0
+    assert queue.stats["dropped"] == 0
+    granted = [member for member in guild.members.values() if guild.role in member.roles]
+    assert len(granted) == 40
+
+
+def test_full_queue_drops_and_counts():
+    release = asyncio.Event()
+
+    async def slow_handler(*args):
+        await release.wait()
+
+    async def scenario():
+        queue = AuthWorkQueue(slow_handler, max_size=5, worker_count=1)
+        queue.start()
+        dropped_before = AUTH_QUEUE_DROPPED.labels().value
+        await asyncio.sleep(0)
+        results = [await queue.submit("시청자", f"{100000 + i}") for i in range(20)]
+        dropped_metric = AUTH_QUEUE_DROPPED.labels().value - dropped_before
+        release.set()
+        await queue.queue.join()
+        await queue.close()
+        return queue, results, dropped_metric
+
+    queue, results, dropped_metric = asyncio.run(scenario())
+    # submit은 대기하지 않으므로 워커가 꺼내 가기 전에 큐 크기(5)를 넘는 15건은 버려짐
+    assert results == [True] * 5 + [False] * 15
+    assert queue.stats["dropped"] == dropped_metric == 15
+    assert queue.stats["processed"] == 5
+    assert queue.stats["max_depth"] == 5
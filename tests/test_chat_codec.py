@@ -0,0 +1,26 @@
+# tests/test_chat_codec.py
+import logging
+
+import pytest
+
+from chzzk_api import CHAT_CODECS, StdlibChatCodec, get_chat_codec
+from conftest import chat_frame
+
+
+def test_unknown_codec_name_falls_back_to_stdlib(caplog):
+    with caplog.at_level(logging.WARNING, logger="chzzk_api"):
+        codec = get_chat_codec("ojson")
+    assert isinstance(codec, StdlibChatCodec) and codec.name == "json"
+    assert "ojson" in caplog.text
+
+
+@pytest.mark.parametrize("name", list(CHAT_CODECS))
+def test_installed_codecs_decode_the_same_frame(name):
+    codec = get_chat_codec(name)
+    if codec.name != name:
+        pytest.skip(f"{name} 미설치")
+    cmd, items = codec.decode_frame(chat_frame([("u1", "123456"), ("u2", "안녕하세요")]))
+    assert cmd == 93101
+    assert [(msg, uid) for msg, _, uid in items] == [("123456", "u1"), ("안녕하세요", "u2")]
+    assert codec.nickname(items[0][1]) == "시청자u1"
+    assert codec.decode_frame(codec.dumps({"ver": "2", "cmd": 0})) == (0, None)
@@ -0,0 +1,109 @@
+# tests/test_chat_dispatcher.py
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+from chat_dispatcher import CHAT_MAX_LENGTH, CONFIRM_SUFFIX, ChatDispatcher
+from chzzk_api import ChzzkAPI, ChzzkAuth
+
+OPENAPI_BASE = "https://openapi.chzzk.naver.com"
+
+
+class FakeChatSendServer:
+    """/open/v1/chats/send 를 흉내 내는 로컬 서버. responses의 (상태 코드, 헤더)를 차례로 돌려주고 마지막 값을 반복합니다."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.requests = []  # [(받은 시각, 본문)]
+        self.runner = None
+        self.base_url = None
+
+    async def handle(self, request):
+        self.requests.append((time.monotonic(), await request.json()))
+        status, headers = self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+        return web.json_response({"code": status}, status=status, headers=headers)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/open/v1/chats/send", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", 0).start()
+        self.base_url = f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.runner.cleanup()
+
+
+def make_api(server):
+    auth = ChzzkAuth()
+    auth.access_token, auth.token_expiry_time = "test-token", datetime.now() + timedelta(days=1)
+    request = auth.request
+    # 실제 send_chat 경로 그대로, 주소만 로컬 서버로 바꿈
+    auth.request = lambda method, url, **kwargs: request(method, url.replace(OPENAPI_BASE, server.base_url), **kwargs)
+    api = ChzzkAPI("test-channel", auth=auth)
+    api.chat_channel_id = "chat-channel"
+    return api
+
+
+def test_retry_after_pauses_before_resend():
+    async def scenario():
+        async with FakeChatSendServer([(429, {"Retry-After": "0.3"}), (200, {})]) as server:
+            api = make_api(server)
+            dispatcher = ChatDispatcher(api, rate=100, burst=3)
+            await dispatcher._send("\"시청자\"" + CONFIRM_SUFFIX)
+            await api.auth.close()
+            return server, dispatcher
+
+    server, dispatcher = asyncio.run(scenario())
+    assert len(server.requests) == 2
+    assert server.requests[1][0] - server.requests[0][0] >= 0.3
+    assert server.requests[0][1] == {"chatChannelId": "chat-channel", "message": "\"시청자\"" + CONFIRM_SUFFIX}
+    assert dispatcher.stats["rate_limited"] == 1
+    assert dispatcher.stats["messages_sent"] == 1
+
+
+def test_rate_limited_send_gives_up_after_max_retries():
+    async def scenario():
+        async with FakeChatSendServer([(429, {"Retry-After": "0.01"})]) as server:
+            api = make_api(server)
+            dispatcher = ChatDispatcher(api, rate=100, burst=3, max_retries=2)
+            await dispatcher._send("\"시청자\"" + CONFIRM_SUFFIX)
+            await api.auth.close()
+            return server, dispatcher
+
+    server, dispatcher = asyncio.run(scenario())
+    assert len(server.requests) == 3
+    assert dispatcher.stats["rate_limited"] == 3
+    assert dispatcher.stats["send_failed"] == 1
+    assert dispatcher.stats["messages_sent"] == 0
+
+
+def test_build_messages_splits_at_max_length():
+    nicknames = [f"시청자{i:02d}" for i in range(30)]
+    messages = ChatDispatcher.build_messages(nicknames)
+
+    assert len(messages) > 1
+    assert all(len(message) <= CHAT_MAX_LENGTH and message.endswith(CONFIRM_SUFFIX) for message in messages)
+    names = [name for message in messages for name in message[:-len(CONFIRM_SUFFIX)].split(", ")]
+    assert names == [f"\"{nickname}\"" for nickname in nicknames]
+
+
+def test_batched_confirmations_are_sent_as_few_messages():
+    async def scenario():
+        async with FakeChatSendServer([(200, {})]) as server:
+            api = make_api(server)
+            dispatcher = ChatDispatcher(api, window=0.05, rate=100, burst=3)
+            dispatcher.start()
+            for i in range(5):
+                dispatcher.confirm(f"시청자{i}")
+            await asyncio.sleep(0.3)
+            await dispatcher.close()
+            await api.auth.close()
+            return server
+
+    server = asyncio.run(scenario())
+    assert [body["message"] for _, body in server.requests] == [", ".join(f"\"시청자{i}\"" for i in range(5)) + CONFIRM_SUFFIX]
@@ -0,0 +1,39 @@
+# tests/test_chat_throttle.py
+import asyncio
+
+import pytest
+import websockets.exceptions
+
+from chat_throttle import ChatThrottle
+from chzzk_api import ChzzkAPI, ChzzkAuth
+from conftest import FakeWebSocket, chat_frame
+
+
+def test_spamming_uid_is_throttled_after_burst():
+    throttle = ChatThrottle(rate=0.1, burst=3)
+    assert [throttle.allow("spammer", now=0.0) for _ in range(5)] == [True, True, True, False, False]
+    assert throttle.allow("viewer", now=0.0)
+    assert throttle.allow("spammer", now=10.0)  # rate(초당 0.1)만큼 토큰이 다시 참
+
+
+def test_receive_chat_throttles_spammer_with_fresh_throttle():
+    async def scenario():
+        api = ChzzkAPI("test-channel", auth=ChzzkAuth())
+        api.set_chat_throttle(ChatThrottle(rate=0.1, burst=3))
+        received = []
+
+        async def on_auth_message(nickname, code, channel_id, uid):
+            received.append((uid, code))
+
+        api.set_on_auth_message_callback(on_auth_message)
+        api.is_listening = True
+        frames = [chat_frame([("spammer", f"{100000 + i}") for i in range(10)] + [("viewer", "654321")])]
+        with pytest.raises(websockets.exceptions.ConnectionClosed):
+            await api._receive_chat(FakeWebSocket(frames))
+        await api.auth.close()
+        return api, received
+
+    api, received = asyncio.run(scenario())
+    assert [uid for uid, _ in received].count("spammer") == 3
+    assert ("viewer", "654321") in received
+    assert api.chat_stats["throttled"] == 7
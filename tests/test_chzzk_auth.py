@@ -0,0 +1,140 @@
+# tests/test_chzzk_auth.py
+import asyncio
+import json
+import socket
+from datetime import datetime, timedelta
+
+import pytest
+
+import chzzk_api
+from chzzk_api import ChzzkAuth, HttpResponse
+from shared_store import MemorySharedStore
+
+
+class FakeTokenEndpoint:
+    """ChzzkAuth.request를 대신해 /auth/v1/token 요청을 세고, 정해 둔 상태 코드로 응답합니다."""
+
+    def __init__(self, status=200, latency=0.05):
+        self.status = status
+        self.latency = latency
+        self.calls = 0
+
+    async def request(self, method, url, timeout=None, **kwargs):
+        assert url.endswith("/auth/v1/token")
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.status != 200:
+            return HttpResponse(self.status, '{"code": %d}' % self.status, {})
+        body = {"content": {"accessToken": f"access-{self.calls}", "refreshToken": f"refresh-{self.calls}", "expiresIn": 86400}}
+        return HttpResponse(200, json.dumps(body), {})
+
+
+@pytest.fixture
+def token_cache(tmp_path, monkeypatch):
+    path = tmp_path / "token_cache.json"
+    monkeypatch.setattr(chzzk_api, "TOKEN_CACHE_FILE", str(path))
+    return path
+
+
+def make_auth(endpoint, expires_in):
+    auth = ChzzkAuth()
+    auth.access_token, auth.refresh_token = "access-0", "refresh-0"
+    auth.token_expiry_time = datetime.now() + expires_in
+    auth._save_tokens_to_cache()
+    auth.request = endpoint.request
+    return auth
+
+
+def test_concurrent_senders_share_one_refresh(token_cache):
+    endpoint = FakeTokenEndpoint()
+
+    async def scenario():
+        auth = make_auth(endpoint, timedelta(seconds=-1))
+        await asyncio.gather(*(auth.get_access_token(verbose=False) for _ in range(100)))
+        return auth
+
+    auth = asyncio.run(scenario())
+    assert endpoint.calls == 1
+    assert auth.access_token == "access-1" and auth.refresh_token == "refresh-1"
+    assert json.loads(token_cache.read_text())["refreshToken"] == "refresh-1"
+
+
+def test_transient_failure_ahead_of_expiry_keeps_tokens(token_cache):
+    endpoint = FakeTokenEndpoint(status=503)
+
+    async def scenario():
+        auth = make_auth(endpoint, timedelta(minutes=20))
+        await auth._single_flight_refresh(verbose=False, ahead=True)
+        return auth
+
+    auth = asyncio.run(scenario())
+    assert endpoint.calls == 1
+    assert auth.access_token == "access-0" and auth.refresh_token == "refresh-0"
+    assert token_cache.exists()
+
+
+def test_rejected_refresh_token_clears_tokens(token_cache):
+    endpoint = FakeTokenEndpoint(status=401)
+
+    async def scenario():
+        auth = make_auth(endpoint, timedelta(minutes=20))
+        await auth._single_flight_refresh(verbose=False, ahead=True)
+        return auth
+
+    auth = asyncio.run(scenario())
+    assert auth.access_token is None and auth.refresh_token is None
+    assert not token_cache.exists()
+
+
+def test_split_processes_refresh_once_through_shared_store(token_cache):
+    endpoint = FakeTokenEndpoint()
+
+    async def scenario():
+        store = MemorySharedStore()
+        ingest, discord = make_auth(endpoint, timedelta(seconds=-1)), make_auth(endpoint, timedelta(seconds=-1))
+        ingest.set_shared_store(store, "ingest:1")
+        discord.set_shared_store(store, "discord:1")
+        await asyncio.gather(*(auth.get_access_token(verbose=False) for auth in [ingest, discord] * 50))
+        return ingest, discord
+
+    ingest, discord = asyncio.run(scenario())
+    assert endpoint.calls == 1
+    assert ingest.refresh_token == discord.refresh_token == "refresh-1"
+
+
+def test_full_auth_without_browser_through_redirect_catcher(token_cache, monkeypatch):
+    from aiohttp import web
+
+    async def interlock(request):
+        raise web.HTTPFound(f"{request.query['redirectUri']}?code=test-code&state={request.query['state']}")
+
+    async def token(request):
+        body = await request.json()
+        assert body["code"] == "test-code"
+        return web.json_response({"content": {"accessToken": "access-1", "refreshToken": "refresh-1", "expiresIn": 86400}})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get("/account-interlock", interlock)
+        app.router.add_post("/auth/v1/token", token)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        base_url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            redirect_port = probe.getsockname()[1]
+        monkeypatch.setattr(chzzk_api, "ACCOUNT_INTERLOCK_URL", f"{base_url}/account-interlock")
+        monkeypatch.setattr(chzzk_api, "TOKEN_URL", f"{base_url}/auth/v1/token")
+        monkeypatch.setattr(chzzk_api, "AUTH_REDIRECT_URI", f"http://127.0.0.1:{redirect_port}")
+        monkeypatch.setenv("CHZZK_AUTH_MODE", "http")
+        auth = ChzzkAuth("test-nid-aut", "test-nid-ses")
+        auth.client_id, auth.client_secret = "test-client", "test-secret"
+        await auth._get_token_with_auth_code()
+        await auth.close()
+        await runner.cleanup()
+        return auth
+
+    auth = asyncio.run(scenario())
+    assert auth.access_token == "access-1" and auth.has_valid_token()
+    assert json.loads(token_cache.read_text())["refreshToken"] == "refresh-1"
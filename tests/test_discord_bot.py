@@ -0,0 +1,119 @@
+# tests/test_discord_bot.py
+import asyncio
+import json
+
+from conftest import FakeChannelManager, FakeGuild, FakeTextChannel, make_bot
+
+
+def test_bound_uid_is_granted_once_under_concurrent_codes(monkeypatch, tmp_path):
+    guild = FakeGuild(latency=0.05)
+
+    async def scenario():
+        bot = make_bot(monkeypatch, tmp_path, guild, bind_uid=True)
+        await bot.state_store.open()
+        first = bot.verifying_users.create(101, guild.id)
+        second = bot.verifying_users.create(102, guild.id)
+        # 같은 치지직 계정이 두 코드를 연달아 입력하고, 워커 두 개가 동시에 처리
+        await asyncio.gather(
+            bot.handle_successful_auth("시청자", first.code, "test-channel", "uid-1"),
+            bot.handle_successful_auth("시청자", second.code, "test-channel", "uid-1"),
+        )
+        # 먼저 처리 중이던 인증이 끝난 뒤 다시 입력해도 uid 확인에서 거부됨
+        await bot.handle_successful_auth("시청자", second.code, "test-channel", "uid-1")
+        bound = await bot.state_store.find_by_uid(guild.id, "uid-1")
+        await bot.state_store.close()
+        return bot, bound
+
+    bot, bound = asyncio.run(scenario())
+    granted = [member.id for member in guild.members.values() if guild.role in member.roles]
+    assert granted == [101]
+    assert bound == [101]
+    assert 102 in bot.verifying_users
+
+
+class BrokenFollowup:
+    def __init__(self):
+        self.calls = 0
+
+    async def send(self, *args, **kwargs):
+        self.calls += 1
+        raise RuntimeError("webhook session closed")
+
+
+def test_expiry_loop_survives_failing_timeout_notice(monkeypatch, tmp_path):
+    guild = FakeGuild()
+
+    async def scenario():
+        bot = make_bot(monkeypatch, tmp_path, guild)
+        await bot.state_store.open()
+        bot.verifying_users.ttl = 0.05
+        followup = BrokenFollowup()
+        bot.verifying_users.create(101, guild.id, followup=followup)
+        bot.verifying_users.ttl = 0.2
+        bot.verifying_users.create(102, guild.id, followup=followup)
+        # 첫 번째 안내 전송이 실패한 뒤에도 두 번째 만료를 처리해야 함
+        task = asyncio.create_task(bot._expire_pending_loop())
+        await asyncio.sleep(0.4)
+        alive = not task.done()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await bot.state_store.close()
+        return bot, followup, alive
+
+    bot, followup, alive = asyncio.run(scenario())
+    assert alive
+    assert followup.calls == 2
+    assert len(bot.verifying_users) == 0
+
+
+def test_one_announcement_per_guild_channel(monkeypatch, tmp_path):
+    channels = {channel_id: FakeTextChannel(channel_id) for channel_id in (10, 11, 12)}
+    manager = FakeChannelManager(auth_channels={1: 11, 2: 12, 3: 10})
+
+    async def scenario():
+        bot = make_bot(monkeypatch, tmp_path, FakeGuild(), manager=manager)
+        monkeypatch.setattr(bot, "get_channel", channels.get)
+        await bot.send_announcement()
+        await bot.send_announcement()  # 내용이 같으면 다시 보내거나 수정하지 않음
+        await bot.send_announcement(offline=True)
+        return bot
+
+    bot = asyncio.run(scenario())
+    assert sorted(bot.announcements) == [10, 11, 12]
+    assert [len(channel.messages) for channel in channels.values()] == [1, 1, 1]
+    assert [channel.messages[0].edits for channel in channels.values()] == [1, 1, 1]
+    assert (tmp_path / "announcement_state.json").exists()
+    assert (tmp_path / "announcement_state_11.json").exists()
+
+
+def test_announcement_follows_auth_channel_change(monkeypatch, tmp_path):
+    channels = {channel_id: FakeTextChannel(channel_id) for channel_id in (10, 20)}
+
+    async def scenario(auth_channel_id):
+        bot = make_bot(monkeypatch, tmp_path, FakeGuild(), auth_channel_id=auth_channel_id)
+        monkeypatch.setattr(bot, "get_channel", channels.get)
+        await bot.send_announcement()
+
+    asyncio.run(scenario(10))
+    # 재시작하면서 DISCORD_AUTH_CHANNEL_ID를 바꾸면 공지 내용이 같아도 새 채널에 공지를 올림
+    asyncio.run(scenario(20))
+    assert [len(channel.messages) for channel in channels.values()] == [1, 1]
+    assert json.loads((tmp_path / "announcement_state.json").read_text())["channel_id"] == 20
+
+
+def test_deleted_announcement_is_recreated_on_restart(monkeypatch, tmp_path):
+    channel = FakeTextChannel(10)
+
+    async def scenario():
+        bot = make_bot(monkeypatch, tmp_path, FakeGuild())
+        monkeypatch.setattr(bot, "get_channel", {10: channel}.get)
+        await bot.send_announcement()
+
+    asyncio.run(scenario())
+    channel.messages.clear()  # 관리자가 공지를 삭제
+    asyncio.run(scenario())
+    assert len(channel.messages) == 1
+    # 남아 있는 메시지는 프로세스마다 처음 한 번만 수정해 확인
+    asyncio.run(scenario())
+    assert len(channel.messages) == 1
+    assert channel.messages[0].edits == 1
@@ -0,0 +1,66 @@
+# tests/test_http_pool.py
+import asyncio
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+import chzzk_api
+from chzzk_api import ChzzkAuth
+
+STUB_DELAY = 0.1
+REQUESTS = 40
+
+
+async def start_stub_server():
+    """치지직 REST 응답을 STUB_DELAY초 늦게 돌려주는 로컬 서버를 띄웁니다."""
+    async def handle(request):
+        await asyncio.sleep(STUB_DELAY)
+        return web.json_response({"code": 200, "content": {"chatChannelId": "stub"}})
+
+    app = web.Application()
+    app.router.add_get("/{tail:.*}", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}/polling/v2/channels/x/live-status"
+
+
+async def timed(coro):
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+
+def test_pooled_session_vs_executor(monkeypatch):
+    monkeypatch.setattr(chzzk_api, "HTTP_POOL_SIZE", REQUESTS)
+
+    async def scenario():
+        runner, url = await start_stub_server()
+        threads_before = threading.active_count()
+
+        # 이전 방식: 동기 HTTP 요청을 스레드 풀에서 실행 (워커 수 = 스레드 수)
+        executor = ThreadPoolExecutor(max_workers=8)
+        loop = asyncio.get_running_loop()
+        fetch = lambda: urllib.request.urlopen(url).read()
+        executor_latencies = await asyncio.gather(*(timed(loop.run_in_executor(executor, fetch)) for _ in range(REQUESTS)))
+        executor_threads = threading.active_count() - threads_before
+        executor.shutdown(wait=True)
+
+        # 현재 방식: 이벤트 루프 안의 aiohttp 커넥션 풀
+        auth = ChzzkAuth()
+        threads_before = threading.active_count()
+        pooled_latencies = await asyncio.gather(*(timed(auth.request("GET", url)) for _ in range(REQUESTS)))
+        pooled_threads = threading.active_count() - threads_before
+        await auth.close()
+        await runner.cleanup()
+        return executor_latencies, executor_threads, pooled_latencies, pooled_threads
+
+    executor_latencies, executor_threads, pooled_latencies, pooled_threads = asyncio.run(scenario())
+    assert executor_threads == 8
+    assert pooled_threads == 0
+    # 스레드 8개로는 40건이 5번에 나눠 처리되지만, 커넥션 풀은 한 번에 처리
+    assert max(pooled_latencies) < 3 * STUB_DELAY < max(executor_latencies)
@@ -0,0 +1,73 @@
+# tests/test_listen_chat.py
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import aiohttp
+import pytest
+import websockets.exceptions
+
+import chzzk_api
+from chzzk_api import ChzzkAPI, ChzzkAuth
+from conftest import FakeWebSocket, chat_frame
+
+
+def make_api(monkeypatch):
+    monkeypatch.setattr(chzzk_api, "RECONNECT_BASE_DELAY", 0.01)
+    auth = ChzzkAuth()
+    auth.access_token, auth.token_expiry_time = "test-token", datetime.now() + timedelta(days=1)
+    api = ChzzkAPI("test-channel", auth=auth)
+    api.set_chat_throttle(None)
+    api.chat_server_uri = "ws://fake"
+    return api
+
+
+def test_listen_chat_survives_channel_lookup_error_and_socket_drop(monkeypatch):
+    async def scenario():
+        api = make_api(monkeypatch)
+        lookups = []
+
+        async def get_chat_channel_id():
+            lookups.append(None)
+            if len(lookups) == 1:
+                raise aiohttp.ClientConnectionError("connection reset")
+            return "chat-channel"
+
+        # 첫 연결은 코드 하나를 받은 뒤 끊기고, 재연결한 두 번째 연결에서 나머지 코드를 받음
+        sockets = [FakeWebSocket([chat_frame([("a", "111111")])]), FakeWebSocket([chat_frame([("b", "222222")])])]
+        monkeypatch.setattr(chzzk_api.websockets, "connect", lambda uri, **kwargs: sockets.pop(0))
+        monkeypatch.setattr(api, "get_chat_channel_id", get_chat_channel_id)
+        received = []
+
+        async def on_auth_message(nickname, code, channel_id, uid):
+            received.append(code)
+            if len(received) == 2:
+                api.is_listening = False
+
+        api.set_on_auth_message_callback(on_auth_message)
+        await asyncio.wait_for(api.listen_chat(), timeout=5)
+        return received, lookups, sockets
+
+    received, lookups, sockets = asyncio.run(scenario())
+    assert received == ["111111", "222222"]
+    assert len(lookups) == 2
+    assert sockets == []
+
+
+def test_failed_heartbeat_closes_connection(monkeypatch):
+    monkeypatch.setattr(chzzk_api, "CHAT_PING_INTERVAL", 0.01)
+
+    async def scenario():
+        api = make_api(monkeypatch)
+        api.is_listening = True
+        websocket = FakeWebSocket([chat_frame([("a", "ㅋㅋ")])] * 100, delay=0.02, fail_send=True)
+        websocket.sent.append("handshake")
+        started = time.monotonic()
+        with pytest.raises(websockets.exceptions.ConnectionClosed):
+            await api._receive_chat(websocket)
+        return websocket, time.monotonic() - started
+
+    websocket, elapsed = asyncio.run(scenario())
+    # PING 전송이 실패하면 남은 프레임(2초 분량)이나 recv 타임아웃을 기다리지 않고 끊음
+    assert websocket.closed
+    assert elapsed < 1.0
@@ -0,0 +1,28 @@
+import asyncio
+import logging
+import socket
+
+import main
+
+
+def test_busy_metrics_port_does_not_stop_startup(caplog):
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        port = busy.getsockname()[1]
+
+        with caplog.at_level(logging.ERROR):
+            server = asyncio.run(main.start_metrics("127.0.0.1", port))
+
+    assert server is None
+    assert f"port={port}" in caplog.text
+
+
+def test_metrics_server_starts_on_free_port():
+    async def scenario():
+        server = await main.start_metrics("127.0.0.1", 0)
+        assert server is not None
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+# tests/test_role_scheduler.py
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from conftest import FakeMember, FakeRole
+from role_scheduler import RoleGrantScheduler
+
+
+class NickForbiddenMember(FakeMember):
+    async def edit(self, roles=None, nick=None, reason=None):
+        self.calls.append(("edit", roles, nick))
+        raise discord.Forbidden(SimpleNamespace(status=403, reason="Forbidden"), "Missing Permissions")
+
+
+def test_grant_adds_role_without_patching_role_list():
+    member = FakeMember(1)
+    role = FakeRole(2)
+
+    result = asyncio.run(RoleGrantScheduler().grant(member, role, nick="시청자(member1)"))
+
+    assert result.role_granted and result.nick_changed
+    assert member.calls == [("add_roles", (role,)), ("edit", None, "시청자(member1)")]
+    assert member.roles == [role] and member.nick == "시청자(member1)"
+
+
+def test_grant_keeps_role_when_nick_is_forbidden():
+    member = NickForbiddenMember(1)
+    role = FakeRole(2)
+
+    result = asyncio.run(RoleGrantScheduler().grant(member, role, nick="시청자(member1)"))
+
+    assert result.role_granted and not result.nick_changed
+    assert member.roles == [role]
+
+
+def test_grant_skips_role_request_when_already_assigned():
+    role = FakeRole(2)
+    member = FakeMember(1)
+    member.roles.append(role)
+
+    asyncio.run(RoleGrantScheduler().grant(member, role, nick="시청자(member1)"))
+
+    assert member.calls == [("edit", None, "시청자(member1)")]
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+from conftest import FakeGuild, make_bot
+from shared_store import MemorySharedStore
+from sharding import SharedEventConsumer
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        await asyncio.sleep(0.01)
+
+
+def grants(guild, member_id):
+    return [call for call in guild.get_member(member_id).calls if call[0] == "add_roles"]
+
+
+def test_duplicate_events_from_two_ingesters_grant_once(monkeypatch, tmp_path):
+    guild = FakeGuild(latency=0.05)
+
+    async def scenario():
+        bot = make_bot(monkeypatch, tmp_path, guild)
+        await bot.state_store.open()
+        store = MemorySharedStore()
+        code = bot.verifying_users.create(101, guild.id).code
+        # 채팅 수신 프로세스 두 개가 같은 채팅을 각각 전달
+        for _ in range(2):
+            await store.push_event("시청자", code, "test-channel", "uid-1")
+        consumer = SharedEventConsumer(store, bot.handle_successful_auth, bot.verifying_users.has_code, poll_timeout=0.05)
+        await consumer.start()
+        await consumer.join()
+        await consumer.close()
+        await bot.state_store.close()
+        return store
+
+    store = asyncio.run(scenario())
+    assert len(grants(guild, 101)) == 1
+    assert asyncio.run(store.queued_events()) == 0
+
+
+def test_unacked_event_is_processed_after_restart(monkeypatch, tmp_path):
+    guild = FakeGuild()
+
+    async def scenario():
+        bot = make_bot(monkeypatch, tmp_path, guild)
+        await bot.state_store.open()
+        store = MemorySharedStore()
+        code = bot.verifying_users.create(101, guild.id).code
+        await store.push_event("시청자", code, "test-channel", "uid-1")
+        # 이전 프로세스가 이벤트를 꺼내 코드를 선점한 뒤 ack 전에 종료됨
+        await store.next_event(0)
+        assert await store.claim(code, 60)
+        consumer = SharedEventConsumer(store, bot.handle_successful_auth, bot.verifying_users.has_code, poll_timeout=0.05)
+        await consumer.start()
+        await consumer.join()
+        await consumer.close()
+        await bot.state_store.close()
+        return store
+
+    store = asyncio.run(scenario())
+    assert len(grants(guild, 101)) == 1
+    assert asyncio.run(store.queued_events()) == 0
+
+
+def test_failed_handler_releases_claim(monkeypatch, tmp_path):
+    guild = FakeGuild()
+
+    async def scenario():
+        bot = make_bot(monkeypatch, tmp_path, guild)
+        await bot.state_store.open()
+        store = MemorySharedStore()
+        code = bot.verifying_users.create(101, guild.id).code
+        calls = []
+
+        async def flaky(*event):
+            calls.append(event)
+            if len(calls) == 1:
+                raise RuntimeError("디스코드 500")
+            await bot.handle_successful_auth(*event)
+
+        consumer = SharedEventConsumer(store, flaky, bot.verifying_users.has_code, poll_timeout=0.05)
+        await consumer.start()
+        await store.push_event("시청자", code, "test-channel", "uid-1")
+        await wait_for(lambda: calls and not consumer.in_flight)
+        # 사용자가 코드를 다시 입력하면 선점이 풀려 있어 처리됨
+        await store.push_event("시청자", code, "test-channel", "uid-1")
+        await wait_for(lambda: len(calls) == 2 and not consumer.in_flight)
+        await consumer.close()
+        await bot.state_store.close()
+        return calls
+
+    calls = asyncio.run(scenario())
+    assert len(calls) == 2
+    assert len(grants(guild, 101)) == 1
+
+
+def test_event_for_other_process_code_is_requeued():
+    async def scenario():
+        store = MemorySharedStore()
+        await store.sync_pending({"123456": time.time() + 60}, [], owner="discord:b")
+        await store.push_event("시청자", "123456")
+        await store.push_event("시청자", "654321")  # 어느 프로세스도 발급하지 않은 코드
+        calls = []
+
+        async def handler(*event):
+            calls.append(event)
+
+        consumer = SharedEventConsumer(store, handler, lambda code: False, poll_timeout=0.05,
+                                       owner="discord:a", requeue_delay=0.01)
+        await consumer.start()
+        await asyncio.sleep(0.2)
+        await consumer.close()
+        return calls, await store.queued_events()
+
+    calls, queued = asyncio.run(scenario())
+    assert calls == []
+    assert queued == 1  # 다른 프로세스의 코드는 남고, 알 수 없는 코드는 버려짐
@@ -0,0 +1,107 @@
+# verification_store.py
+import heapq
+import secrets
+import time
+
+
+class PendingVerification:
+    __slots__ = ("user_id", "code", "expires_at", "guild_id", "followup")
+
+    def __init__(self, user_id, code, expires_at, guild_id=None, followup=None):
+        self.user_id = user_id
+        self.code = code
+        self.expires_at = expires_at
+        self.guild_id = guild_id
+        self.followup = followup  # 시간 초과 안내를 보낼 interaction.followup (Webhook)
+
+
+class PendingVerificationStore:
+    """진행 중인 인증을 디스코드 유저 ID와 인증 코드 양방향으로 O(1) 조회할 수 있게 보관합니다."""
+
+    def __init__(self, ttl=180, code_digits=6):
+        self.ttl = ttl
+        self.code_low = 10 ** (code_digits - 1)
+        self.code_high = 10 ** code_digits - 1
+        self._by_user = {}  # {discord_user_id: PendingVerification}
+        self._by_code = {}  # {"123456": discord_user_id}
+        self._expiry_heap = []  # [(expires_at, code, discord_user_id)] 삭제된 항목은 꺼낼 때 건너뜀
+
+    def __len__(self):
+        return len(self._by_user)
+
+    def __contains__(self, user_id):
+        return self.get_by_user(user_id) is not None
+
+    def _generate_code(self):
+        # 추측할 수 없도록 secrets로 뽑고, 이미 발급된 코드와 겹치지 않을 때까지 다시 뽑음
+        while True:
+            code = str(self.code_low + secrets.randbelow(self.code_high - self.code_low + 1))
+            if code not in self._by_code:
+                return code
+
+    def _add(self, entry):
+        self._by_user[entry.user_id] = entry
+        self._by_code[entry.code] = entry.user_id
+        heapq.heappush(self._expiry_heap, (entry.expires_at, entry.code, entry.user_id))
+        return entry
+
+    def create(self, user_id, guild_id=None, followup=None, now=None):
+        now = time.monotonic() if now is None else now
+        self.remove(user_id)
+        return self._add(PendingVerification(user_id, self._generate_code(), now + self.ttl, guild_id, followup))
+
+    def restore(self, user_id, code, guild_id, expires_at):
+        """재시작 후 저장소에서 불러온 인증 대기 정보를 같은 코드로 복원합니다."""
+        if code in self._by_code:
+            return None
+        self.remove(user_id)
+        return self._add(PendingVerification(user_id, code, expires_at, guild_id))
+
+    def _is_expired(self, entry, now):
+        return entry.expires_at <= (time.monotonic() if now is None else now)
+
+    def get_by_user(self, user_id, now=None):
+        entry = self._by_user.get(user_id)
+        if entry is None or self._is_expired(entry, now):
+            # 만료된 항목의 삭제는 pop_expired가 담당 (시간 초과 안내를 보내야 하므로)
+            return None
+        return entry
+
+    def get_by_code(self, code, now=None):
+        user_id = self._by_code.get(code)
+        if user_id is None:
+            return None
+        return self.get_by_user(user_id, now)
+
+    def entries(self):
+        return list(self._by_user.values())
+
+    def has_code(self, code):
+        return code in self._by_code
+
+    def remove(self, user_id):
+        entry = self._by_user.pop(user_id, None)
+        if entry is not None:
+            self._by_code.pop(entry.code, None)
+        return entry
+
+    def remove_if_code(self, user_id, code):
+        """지정한 코드가 아직 해당 유저의 코드일 때만 삭제합니다. (재발급된 코드는 보존)"""
+        entry = self._by_user.get(user_id)
+        if entry is None or entry.code != code:
+            return None
+        return self.remove(user_id)
+
+    def next_expiry(self):
+        return self._expiry_heap[0][0] if self._expiry_heap else None
+
+    def pop_expired(self, now=None):
+        """만료된 인증을 한 번에 꺼내 삭제합니다. 이미 삭제되었거나 재발급된 항목은 건너뜁니다."""
+        now = time.monotonic() if now is None else now
+        expired = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, code, user_id = heapq.heappop(self._expiry_heap)
+            entry = self.remove_if_code(user_id, code)
+            if entry is not None:
+                expired.append(entry)
+        return expired